@@ -0,0 +1,51 @@
+"""
+Minimal in-process ASGI driver for benchmarks
+
+Calls an ASGI app directly with a hand-built HTTP scope, skipping sockets
+and HTTP client libraries, so their cost does not drown out what is being
+measured.
+"""
+from urllib.parse import urlencode
+
+
+async def request(app, method : str, path : str, query : dict | None = None,
+                  headers : dict | None = None, body : bytes = b"") -> tuple[int, bytes]:
+    """Send one request to `app` and return (status, response body)"""
+    raw_headers = [(b"host", b"bench")] + [(key.lower().encode(), value.encode()) for key, value in (headers or {}).items()]
+    if body:
+        raw_headers.append((b"content-length", str(len(body)).encode()))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": urlencode(query or {}, doseq=True).encode(),
+        "root_path": "",
+        "headers": raw_headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+        "state": {},
+    }
+    sent = False
+    status = 0
+    chunks = []
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, b"".join(chunks)
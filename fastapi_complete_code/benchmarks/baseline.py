@@ -0,0 +1,46 @@
+"""
+Baselines for the benchmarks: save a run's results, check later runs against them
+
+A benchmark hands over its results as a flat `name -> number` dict.
+--save-baseline writes it to a JSON file; --baseline reads one back and
+reports every name whose number moved the wrong way by more than
+--threshold (relative), and the benchmark then exits with status 1.
+Timings depend on the CPU, the Python build and what else is running, so
+a baseline only means something on the machine that recorded it.
+"""
+import json
+import sys
+
+
+def add_arguments(parser, threshold : float):
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the results to a JSON file")
+    parser.add_argument("--baseline", metavar="PATH", help="compare the results with a saved baseline")
+    parser.add_argument("--threshold", type=float, default=threshold, help="allowed relative regression against --baseline")
+
+
+def regressions(results : dict, baseline : dict, threshold : float, unit : str = "", higher_is_better=lambda name: False) -> list[str]:
+    """One line per result that is worse than its baseline by more than `threshold`; lower is better unless `higher_is_better(name)`"""
+    found = []
+    for name, value in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if value < base * (1 - threshold) if higher_is_better(name) else value > base * (1 + threshold):
+            found.append(f"{name}: {base:.2f} -> {value:.2f}{unit}")
+    return found
+
+
+def finish(args, results : dict, unit : str = "", higher_is_better=lambda name: False, failed : bool = False):
+    """Save and / or check `results` as the command line asked, then exit with status 1 if `failed` or anything regressed"""
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+        print(f"baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            found = regressions(results, json.load(baseline_file), args.threshold, unit, higher_is_better)
+        for line in found:
+            print(f"REGRESSION {line}")
+        failed = failed or bool(found)
+    sys.exit(1 if failed else 0)
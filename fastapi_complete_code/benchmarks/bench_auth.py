@@ -0,0 +1,105 @@
+"""
+Auth overhead benchmark: signed-token checks per call and per request
+
+Measures TokenVerifier.verify on a cold cache (full HMAC check) and a warm
+one, AuthMiddleware around an ASGI app that does nothing, then the time
+per request of GET /filters/ served in-process with and without
+AuthMiddleware. Both apps get the same headers, so the client's cost of
+sending them is not counted as auth.
+
+Request timings are noisy, so the two apps are measured alternately
+--repeat times, taking turns at going first, and the median of the
+per-run differences is reported together with its range.
+
+    python -m benchmarks.bench_auth --requests 5000 --repeat 9
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from dependencies.auth import API_KEYS, TokenVerifier, token_verifier
+from middleware.auth import AuthMiddleware
+from router import filters
+
+
+def per_call(function, rounds) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        function()
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+async def per_asgi_call(app, scope, rounds) -> float:
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+async def per_request(app, headers, requests) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(100):
+            (await client.get("/filters/", headers=headers)).raise_for_status()
+        started = time.perf_counter()
+        for _ in range(requests):
+            await client.get("/filters/", headers=headers)
+        return (time.perf_counter() - started) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=50_000)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=7, help="alternating runs of both apps")
+    args = parser.parse_args()
+
+    verifier = TokenVerifier(b"benchmark-secret", cache_size=args.rounds)
+    tokens = [verifier.issue(f"user{i}") for i in range(args.rounds)]
+    tokens_left = iter(tokens)
+    cold = per_call(lambda: verifier.verify(next(tokens_left)), args.rounds)
+    warm = per_call(lambda: verifier.verify(tokens[0]), args.rounds)
+    print(f"verify, cold cache   {cold:8.2f} us/call")
+    print(f"verify, cached       {warm:8.2f} us/call")
+
+    async def empty_app(scope, receive, send):
+        pass
+
+    scope = {"type": "http", "path": "/filters/", "headers": [
+        (b"host", b"bench"), (b"accept", b"*/*"), (b"x-key", API_KEYS[0]), (b"x-token", tokens[0].encode()),
+    ]}
+    bare = asyncio.run(per_asgi_call(empty_app, scope, args.rounds))
+    guarded = asyncio.run(per_asgi_call(AuthMiddleware(empty_app, verifier, API_KEYS), scope, args.rounds))
+    print(f"middleware, cached   {guarded - bare:8.2f} us/call")
+
+    open_app = FastAPI()
+    open_app.include_router(filters.router)
+    guarded_app = FastAPI()
+    guarded_app.include_router(filters.router)
+    guarded_app.add_middleware(AuthMiddleware, verifier=token_verifier, api_keys=API_KEYS)
+    headers = {"X-Key": API_KEYS[0].decode(), "X-Token": token_verifier.issue("bench")}
+
+    without_auth, with_auth = [], []
+    for repeat in range(args.repeat):
+        # swap which app goes first every run, so drift over a run does not count against one of them
+        runs = [(without_auth, open_app), (with_auth, guarded_app)]
+        for timings, app in runs if repeat % 2 == 0 else reversed(runs):
+            timings.append(asyncio.run(per_request(app, headers, args.requests)))
+    overhead = [guarded - open_ for open_, guarded in zip(without_auth, with_auth)]
+    print(f"request, no auth     {statistics.median(without_auth):8.1f} us  (median of {args.repeat} runs)")
+    print(f"request, auth        {statistics.median(with_auth):8.1f} us")
+    print(f"auth per request     {statistics.median(overhead):+8.1f} us  (runs ranged {min(overhead):+.1f} to {max(overhead):+.1f} us)")
+
+
+if __name__ == "__main__":
+    main()
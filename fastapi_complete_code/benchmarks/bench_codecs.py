@@ -0,0 +1,60 @@
+"""
+Codec benchmark: JSON vs. MessagePack on Item and ProductOut payloads
+
+For every registered codec, measures encode and decode throughput of the
+bodies the item and product endpoints exchange, on their own and
+including pydantic validation on the way in, plus the encoded size.
+
+    python -m benchmarks.bench_codecs --tags 20
+"""
+import argparse
+import time
+
+from schemas.items import Item
+from schemas.product import ProductOut
+from serialization.codecs import codecs
+
+
+def throughput(function, rounds) -> float:
+    function()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        function()
+    return rounds / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tags", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=50_000)
+    args = parser.parse_args()
+
+    item = Item(
+        name="Smartphone",
+        description="A high-end smartphone with a great camera",
+        price=799.99,
+        tax=20.2,
+        tags=[f"tag{i}" for i in range(args.tags)],
+        image="https://example.com/smartphone.png",
+        timestamp="2024-01-01T12:30:00",
+    )
+    payloads = {
+        "Item": (Item, item.model_dump(mode="json")),
+        "ProductOut": (ProductOut, ProductOut.model_validate(item.model_dump()).model_dump(mode="json")),
+    }
+    if len(codecs) == 1:
+        print("msgpack is not installed; only JSON is measured")
+
+    print(f"{'payload':<11} {'codec':<8} {'bytes':>6} {'encode/s':>12} {'decode/s':>12} {'decode+validate/s':>18}")
+    for label, (model, content) in payloads.items():
+        for codec in codecs:
+            body = codec.encode(content)
+            assert codec.decode(body) == content
+            encode = throughput(lambda: codec.encode(content), args.rounds)
+            decode = throughput(lambda: codec.decode(body), args.rounds)
+            validate = throughput(lambda: model.model_validate(codec.decode(body)), args.rounds)
+            print(f"{label:<11} {codec.name:<8} {len(body):>6} {encode:>12,.0f} {decode:>12,.0f} {validate:>18,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+In-process HTTP load benchmark of every route of the app in main.py
+
+Drives `main.app` through benchmarks.asgi_client (no sockets) with
+realistic payloads: a seeded catalog of wide, tag-heavy items, multi-file
+uploads, resumable uploads and bulk NDJSON bodies. Prints throughput and
+p50 / p99 / p99.9 latency per scenario.
+
+--save-baseline / --baseline / --threshold (see benchmarks.baseline)
+store and compare each scenario's p99 and throughput; the run exits with
+status 1 if either got worse by more than the threshold, or if any
+request got an unexpected status.
+
+    python -m benchmarks.bench_http --requests 2000 --save-baseline bench-http.json
+    python -m benchmarks.bench_http --baseline bench-http.json --threshold 0.25
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+
+from benchmarks import baseline
+from benchmarks.asgi_client import request
+
+TAG_POOL = [f"tag{i}" for i in range(200)]
+BOUNDARY = "bench-boundary-7d1f"
+
+
+def wide_item(i : int, tags : int = 20) -> dict:
+    rng = random.Random(i)
+    return {
+        "name": f"Item {i}",
+        "description": f"Long description of item {i}. " * 20,
+        "price": 50.0 + rng.random() * 950,
+        "tax": round(rng.random() * 20, 2),
+        "tags": rng.sample(TAG_POOL, tags),
+        "image": f"https://images.example.com/items/{i}.png",
+        "timestamp": "2024-01-01T12:00:00",
+    }
+
+
+def multipart(field : str, files : list[tuple[str, bytes]]) -> tuple[dict, bytes]:
+    parts = []
+    for filename, content in files:
+        parts.append(
+            f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f"Content-Type: application/octet-stream\r\n\r\n".encode() + content + b"\r\n"
+        )
+    body = b"".join(parts) + f"--{BOUNDARY}--\r\n".encode()
+    return {"content-type": f"multipart/form-data; boundary={BOUNDARY}"}, body
+
+
+def payload(i : int, size : int) -> bytes:
+    # unique per request so uploads are not all deduplicated into one blob
+    return i.to_bytes(8, "big") * (size // 8)
+
+
+def build_scenarios(app, item_store, upload_sessions, args) -> dict:
+    """name -> async call(i) returning the final status; expected status is the value's second element"""
+    catalog = args.items
+    json_headers = {"content-type": "application/json"}
+
+    def simple(method, path, query=None, headers=None, body=b""):
+        async def call(i):
+            status, _ = await request(app, method, path(i) if callable(path) else path,
+                                      query(i) if callable(query) else query,
+                                      headers(i) if callable(headers) else headers,
+                                      body(i) if callable(body) else body)
+            return status
+        return call
+
+    from dependencies.conditional import version_etag
+    etags = {}
+
+    async def conditional_read(i):
+        item_id = f"item-{i % catalog}"
+        if item_id not in etags:
+            # asgi_client does not return headers, so build the ETag the way the route does
+            etags[item_id] = version_etag(item_store.epoch, item_store.get_versioned(item_id)[0], "json")
+        status, _ = await request(app, "GET", f"/items/{item_id}", headers={"if-none-match": etags[item_id]})
+        return status
+
+    async def resumable_upload(i):
+        content = payload(i, 256 * 1024)
+        create = json.dumps({"filename": f"r{i}.bin", "length": len(content), "sha256": hashlib.sha256(content).hexdigest()}).encode()
+        status, body = await request(app, "POST", "/files/uploads", headers=json_headers, body=create)
+        if status != 201:
+            return status
+        upload_id = json.loads(body)["upload_id"]
+        checksum = "sha256 " + base64.b64encode(hashlib.sha256(content).digest()).decode()
+        status, _ = await request(app, "PATCH", f"/files/uploads/{upload_id}", body=content, headers={
+            "content-type": "application/offset+octet-stream", "upload-offset": "0", "upload-checksum": checksum,
+        })
+        if status != 200:
+            return status
+        status, _ = await request(app, "POST", f"/files/uploads/{upload_id}/complete")
+        return status
+
+    session_ids = []
+
+    async def read_session(i):
+        status, _ = await request(app, "GET", f"/files/uploads/{session_ids[i % len(session_ids)]}")
+        return status
+
+    async def delete_session(i):
+        status, _ = await request(app, "DELETE", f"/files/uploads/{session_ids.pop()}")
+        return status
+
+    def bulk_items(i):
+        return "\n".join(json.dumps({"op": "upsert", "item_id": f"bulk-{i}-{n}", "item": wide_item(n)}) for n in range(100)).encode()
+
+    def bulk_users(i):
+        return "\n".join(json.dumps({"username": f"bulk-{i}-{n}", "email": f"bulk-{i}-{n}@example.com", "password": "correct horse"}) for n in range(20)).encode()
+
+    tag_query = lambda i: {"tags": random.Random(i).sample(TAG_POOL, 2), "limit": 50}
+    one_file = lambda i: multipart("file", [(f"f{i}.bin", payload(i, 64 * 1024))])
+    many_files = lambda i: multipart("files", [(f"f{i}-{n}.bin", payload(i * 4 + n, 256 * 1024)) for n in range(4)])
+
+    scenarios = {
+        "GET /items/ tags": (simple("GET", "/items/", tag_query), 200),
+        "GET /items/ price range": (simple("GET", "/items/", lambda i: {"price_min": 100 + i % 500, "price_max": 200 + i % 500, "limit": 50}), 200),
+        "GET /items/export tags": (simple("GET", "/items/export", lambda i: {"tags": [TAG_POOL[i % len(TAG_POOL)]], "format": "ndjson"}), 200),
+        "GET /items/{item_id}": (simple("GET", lambda i: f"/items/item-{i % catalog}"), 200),
+        "GET /items/{item_id} If-None-Match": (conditional_read, 304),
+        "GET /items/{item_id} msgpack": (simple("GET", lambda i: f"/items/item-{i % catalog}", headers={"accept": "application/msgpack"}), 200),
+        "PUT /items/{item_id}/ wide": (simple("PUT", lambda i: f"/items/put-{i}/", headers=json_headers, body=lambda i: json.dumps(wide_item(i, tags=50)).encode()), 200),
+        "PATCH /items/{item_id}": (simple("PATCH", lambda i: f"/items/item-{i % catalog}", headers=json_headers, body=lambda i: json.dumps({"price": 60 + i % 900}).encode()), 200),
+        "PATCH /items/{item_id} merge": (simple("PATCH", lambda i: f"/items/item-{i % catalog}", headers={"content-type": "application/merge-patch+json"}, body=b'{"image":null}'), 200),
+        "DELETE /items/{item_id}": (simple("DELETE", lambda i: f"/items/delete-{i}"), 204),
+        "POST /items/bulk x100": (simple("POST", "/items/bulk", headers={"content-type": "application/x-ndjson"}, body=bulk_items), 200),
+        "POST /users/": (simple("POST", "/users/", headers=json_headers, body=lambda i: json.dumps({"username": f"user-{i}", "email": f"user-{i}@example.com", "password": "correct horse"}).encode()), 200),
+        "POST /users/bulk x20": (simple("POST", "/users/bulk", headers={"content-type": "application/x-ndjson"}, body=bulk_users), 200),
+        "GET /users/{username}": (simple("GET", "/users/seed-user"), 200),
+        "POST /files/upload 64KiB": (simple("POST", "/files/upload", headers=lambda i: one_file(i)[0], body=lambda i: one_file(i)[1]), 200),
+        "POST /files/upload/multiple 4x256KiB": (simple("POST", "/files/upload/multiple", headers=lambda i: many_files(i)[0], body=lambda i: many_files(i)[1]), 200),
+        "files resumable 256KiB": (resumable_upload, 200),
+        "GET /files/uploads/{upload_id}": (read_session, 200),
+        "DELETE /files/uploads/{upload_id}": (delete_session, 204),
+        "GET /filters/ tags": (simple("GET", "/filters/", lambda i: {"tags": TAG_POOL[:30], "limit": 20}), 200),
+        "GET /product/": (simple("GET", "/product/", lambda i: {"user_id": f"item-{i % catalog}"}), 200),
+        "GET /metrics": (simple("GET", "/metrics"), 200),
+    }
+
+    def setup():
+        for i in range(catalog):
+            item_store.put(f"item-{i}", wide_item(i))
+        for i in range(args.requests + args.warmup):
+            item_store.put(f"delete-{i}", wide_item(i))
+        for i in range(args.requests + args.warmup):
+            session_ids.append(upload_sessions.create(f"s{i}.bin", "application/octet-stream", 1024, None)["upload_id"])
+
+    return scenarios, setup
+
+
+async def run_scenario(call, expected, requests, warmup, concurrency):
+    for i in range(warmup):
+        await call(requests + i)
+
+    latencies = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            status = await call(i)
+            latencies.append(time.perf_counter() - started)
+            errors += status != expected
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    def percentile(fraction):
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": percentile(0.50),
+        "p99_ms": percentile(0.99),
+        "p999_ms": percentile(0.999),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=1000, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=1, help="requests in flight at once")
+    parser.add_argument("--items", type=int, default=20_000, help="size of the seeded catalog")
+    parser.add_argument("--only", help="regular expression selecting scenarios by name")
+    parser.add_argument("--scrypt-n", type=int, default=2 ** 10,
+                        help="scrypt cost for signups (production default is 16384, which makes POST /users/ all hashing)")
+    baseline.add_arguments(parser, threshold=0.2)
+    args = parser.parse_args()
+
+    # configure the app before main.py is imported: throwaway storage, no write-ahead log
+    workdir = tempfile.mkdtemp(prefix="bench-http-")
+    os.environ["BLOB_STORE_DIR"] = os.path.join(workdir, "blobs")
+    os.environ["PASSWORD_SCRYPT_N"] = str(args.scrypt_n)
+    for name in ("ITEM_WAL_PATH", "ITEM_SNAPSHOT_PATH", "AUTH_ENABLED", "PROFILE_TOKEN", "PROFILE_SAMPLE_RATE"):
+        os.environ.pop(name, None)
+
+    from databases.fake_db import item_store, user_store
+    from dependencies.passwords import password_hasher, hash_password
+    from main import app
+    from storage.uploads import upload_sessions
+
+    scenarios, setup = build_scenarios(app, item_store, upload_sessions, args)
+    setup()
+    user_store.add({"username": "seed-user", "email": "seed@example.com", "full_name": None,
+                    "hashed_password": hash_password("seed", args.scrypt_n, 8, 1)})
+
+    results = {}
+    print(f"{'scenario':<40} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'p99.9 ms':>9} {'errors':>7}")
+    try:
+        for name, (call, expected) in scenarios.items():
+            if args.only and not re.search(args.only, name):
+                continue
+            result = asyncio.run(run_scenario(call, expected, args.requests, args.warmup, args.concurrency))
+            results[name] = result
+            print(f"{name:<40} {result['rps']:>9.0f} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['p999_ms']:>9.2f} {result['errors']:>7}")
+    finally:
+        password_hasher.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    compared = {}
+    for name, result in results.items():
+        compared[f"{name} p99 ms"] = result["p99_ms"]
+        compared[f"{name} req/s"] = result["rps"]
+    baseline.finish(args, compared, higher_is_better=lambda name: name.endswith(" req/s"),
+                    failed=any(result["errors"] for result in results.values()))
+
+
+if __name__ == "__main__":
+    main()
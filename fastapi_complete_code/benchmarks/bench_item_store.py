@@ -0,0 +1,115 @@
+"""
+Item store concurrency benchmark
+
+Runs reader threads doing `get` on random items while writer threads keep
+PATCHing, once against ItemRepository (lock-free snapshot reads, striped
+write locks) and once against a dict guarded by a single lock, which is
+what adding a plain lock to the old `fake_db.items` would have given.
+It then checks that concurrent read-modify-write updates lose nothing.
+
+    python -m benchmarks.bench_item_store --items 100000 --workers 1 2 4 8 16 40
+"""
+import argparse
+import random
+import threading
+import time
+
+from databases.item_repository import ItemRepository
+
+
+class SingleLockStore:
+    def __init__(self, initial):
+        self._items = dict(initial)
+        self._lock = threading.Lock()
+
+    def get(self, item_id):
+        with self._lock:
+            return self._items.get(item_id)
+
+    def update(self, item_id, apply):
+        with self._lock:
+            self._items[item_id] = apply(self._items[item_id])
+            return self._items[item_id]
+
+
+def make_items(count):
+    return {
+        f"item_{i}": {"name": f"Item {i}", "price": 50.0 + i % 500, "tags": [f"tag{i % 20}"], "counter": 0}
+        for i in range(count)
+    }
+
+
+def run(store, ids, readers, writers, duration):
+    stop = threading.Event()
+    reads = [0] * readers
+    writes = [0] * writers
+
+    def read_loop(slot):
+        rng = random.Random(slot)
+        get = store.get
+        done = 0
+        while not stop.is_set():
+            for _ in range(256):
+                get(ids[rng.randrange(len(ids))])
+            done += 256
+        reads[slot] = done
+
+    def write_loop(slot):
+        rng = random.Random(1000 + slot)
+        done = 0
+        while not stop.is_set():
+            store.update(ids[rng.randrange(len(ids))], lambda item: {**item, "counter": item["counter"] + 1})
+            done += 1
+        writes[slot] = done
+
+    threads = [threading.Thread(target=read_loop, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=write_loop, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(reads) / duration, sum(writes) / duration
+
+
+def check_lost_updates(threads, per_thread):
+    store = ItemRepository({"hot": {"name": "hot", "price": 50.0, "counter": 0}})
+
+    def bump():
+        for _ in range(per_thread):
+            store.update("hot", lambda item: {**item, "counter": item["counter"] + 1})
+
+    workers = [threading.Thread(target=bump) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return store.get("hot")["counter"], threads * per_thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16, 40])
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=1.0)
+    args = parser.parse_args()
+
+    items = make_items(args.items)
+    ids = list(items)
+    stores = {"ItemRepository": ItemRepository(items), "single lock": SingleLockStore(items)}
+
+    print(f"{args.items} items, {args.writers} writer threads, {args.duration}s per run")
+    print(f"{'store':<16}{'readers':>8}{'reads/s':>14}{'writes/s':>12}")
+    for readers in args.workers:
+        for name, store in stores.items():
+            reads, writes = run(store, ids, readers, args.writers, args.duration)
+            print(f"{name:<16}{readers:>8}{reads:>14,.0f}{writes:>12,.0f}")
+
+    counted, expected = check_lost_updates(threads=16, per_thread=2_000)
+    print(f"lost-update check: counter={counted} expected={expected} {'ok' if counted == expected else 'LOST UPDATES'}")
+
+
+if __name__ == "__main__":
+    main()
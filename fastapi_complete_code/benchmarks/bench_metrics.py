@@ -0,0 +1,65 @@
+"""
+Metrics overhead benchmark: requests with and without MetricsMiddleware
+
+Serves GET /items/{item_id} and GET /filters/ in-process from two apps
+with the same routers, one wrapped in MetricsMiddleware, and prints the
+time per request of each and the difference. Also times
+MetricsRegistry.observe on its own.
+
+    python -m benchmarks.bench_metrics --requests 20000
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI
+
+from benchmarks.asgi_client import request
+from middleware.metrics import MetricsMiddleware, MetricsRegistry
+from router import filters, items
+from serialization.negotiation import NegotiatedResponse
+
+
+def build_app(with_metrics : bool) -> FastAPI:
+    app = FastAPI(default_response_class=NegotiatedResponse)
+    app.include_router(items.router)
+    app.include_router(filters.router)
+    if with_metrics:
+        app.add_middleware(MetricsMiddleware, registry=MetricsRegistry())
+    return app
+
+
+async def per_request(app, path, requests) -> float:
+    for _ in range(200):
+        status, _ = await request(app, "GET", path)
+        assert status == 200, status
+    started = time.perf_counter()
+    for _ in range(requests):
+        await request(app, "GET", path)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=10_000)
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    rounds = 200_000
+    started = time.perf_counter()
+    for i in range(rounds):
+        registry.observe("/items/{item_id}", "GET", 200, i * 1e-7, 0, 100)
+    print(f"observe on its own   {(time.perf_counter() - started) / rounds * 1e6:8.2f} us")
+
+    plain, measured = build_app(False), build_app(True)
+    for path in ("/items/item_1", "/filters/"):
+        # alternate the runs so drift in machine speed hits both sides alike
+        without_metrics = with_metrics = 0.0
+        for _ in range(3):
+            without_metrics += asyncio.run(per_request(plain, path, args.requests)) / 3
+            with_metrics += asyncio.run(per_request(measured, path, args.requests)) / 3
+        print(f"{path:<20} {without_metrics:8.1f} us plain  {with_metrics:8.1f} us with metrics  ({with_metrics - without_metrics:+.1f} us)")
+
+
+if __name__ == "__main__":
+    main()
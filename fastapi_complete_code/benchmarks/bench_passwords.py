@@ -0,0 +1,46 @@
+"""
+Signup throughput benchmark: scrypt hashing vs. password worker count
+
+For each worker count, starts a PasswordHasher, warms its processes up and
+then hashes a burst of passwords concurrently, the way a signup spike
+reaches create_user. Prints hashes per second and the speedup over one
+worker; scaling flattens out at the number of CPU cores.
+
+    python -m benchmarks.bench_passwords --workers 1 2 4 8 --signups 200
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from dependencies.passwords import PasswordHasher
+
+
+async def burst(hasher : PasswordHasher, signups : int) -> float:
+    await asyncio.gather(*(hasher.hash("warm-up") for _ in range(hasher.max_workers)))
+    started = time.perf_counter()
+    await asyncio.gather(*(hasher.hash(f"password-{i}") for i in range(signups)))
+    return signups / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--signups", type=int, default=100)
+    parser.add_argument("--n", type=int, default=2 ** 14, help="scrypt cost parameter")
+    args = parser.parse_args()
+
+    print(f"scrypt n={args.n} r=8 p=1, {args.signups} concurrent signups, {os.cpu_count()} CPUs")
+    baseline = None
+    for workers in sorted(set(args.workers)):
+        hasher = PasswordHasher(workers, max_queue=args.signups + workers, n=args.n)
+        try:
+            rate = asyncio.run(burst(hasher, args.signups))
+        finally:
+            hasher.shutdown()
+        baseline = baseline or rate
+        print(f"{workers:>3} workers  {rate:8.1f} signups/s  x{rate / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    main()
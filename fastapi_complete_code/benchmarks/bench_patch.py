@@ -0,0 +1,69 @@
+"""
+PATCH benchmark: whole-model revalidation vs. per-field patches on wide items
+
+Times the merge step of PATCH /items/{item_id} for a one-field change to
+an item with many tags and long text fields, the old way (validate the
+stored record as ItemBase, model_copy, convert back to a dict) and with
+ModelPatcher (validate the changed field, shallow merge).
+
+    python -m benchmarks.bench_patch --tags 1000
+"""
+import argparse
+import time
+import tracemalloc
+
+from schemas.items import ItemBase
+from schemas.patch import ModelPatcher
+
+
+def model_copy_patch(stored : dict, patch : dict) -> dict:
+    update_data = ItemBase.model_validate(patch | {"name": stored["name"], "price": stored["price"]}).model_dump(exclude_unset=True)
+    return ItemBase.model_validate(stored).model_copy(update=update_data).model_dump()
+
+
+def field_patch(patcher : ModelPatcher, stored : dict, patch : dict) -> dict:
+    changes, removed = patcher.validate(patch)
+    return patcher.apply(stored, changes, removed)
+
+
+def measure(label, apply, rounds):
+    apply()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        apply()
+    seconds = time.perf_counter() - started
+
+    tracemalloc.start()
+    apply()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {seconds / rounds * 1e6:10.2f} us/patch  {peak:>10,} B peak")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tags", type=int, default=500)
+    parser.add_argument("--text", type=int, default=10_000, help="length of the description")
+    parser.add_argument("--rounds", type=int, default=20_000)
+    args = parser.parse_args()
+
+    stored = {
+        "name": "Wide item",
+        "description": "x" * args.text,
+        "price": 120.0,
+        "tags": [f"tag{i}" for i in range(args.tags)],
+        "image": "https://example.com/item.png",
+        "tax": 2.5,
+        "timestamp": "2024-01-01T00:00:00",
+    }
+    patch = {"tax": 3.0}
+    patcher = ModelPatcher(ItemBase)
+    assert model_copy_patch(stored, patch) == field_patch(patcher, stored, patch)
+
+    print(f"{args.tags} tags, {args.text} character description, patching {patch}")
+    measure("validate + model_copy", lambda: model_copy_patch(stored, patch), args.rounds)
+    measure("ModelPatcher", lambda: field_patch(patcher, stored, patch), args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Schema micro-benchmark: validation and serialization of the request models
+
+For ItemBase, Item, UserIn, FilterParams and Image, at each payload width
+(tags per item or filter, and a description / full name that grows with
+it), measures:
+
+    validate        model_validate of one dict
+    validate_json   model_validate_json of one JSON body
+    validate_batch  one TypeAdapter(list[Model]) call over --batch dicts, per item
+    dump            model_dump(mode="json")
+    dump_json       model_dump_json
+    copy            model_copy with one field updated
+
+Each figure is the best of --repeat timed runs, in microseconds per model.
+--save-baseline / --baseline / --threshold (see benchmarks.baseline) store
+and compare them, failing the run if any case got slower.
+
+    python -m benchmarks.bench_schemas --widths 0,20,200 --save-baseline bench-schemas.json
+    python -m benchmarks.bench_schemas --baseline bench-schemas.json --threshold 0.15
+"""
+import argparse
+import json
+import re
+import time
+
+from pydantic import TypeAdapter
+
+from benchmarks import baseline
+from schemas.filter import FilterParams
+from schemas.items import Image, Item, ItemBase
+from schemas.users import UserIn
+
+
+def payloads(width : int) -> dict:
+    """model -> (valid input dict, field updated by model_copy)"""
+    tags = [f"tag{i}" for i in range(width)]
+    item = {
+        "name": "Smartphone",
+        "description": "A high-end smartphone with a great camera. " * (1 + width // 10),
+        "price": 799.99,
+        "tax": 20.2,
+        "tags": tags,
+        "image": "https://example.com/smartphone.png",
+        "timestamp": "2024-01-01T12:30:00",
+    }
+    return {
+        "ItemBase": (ItemBase, item, {"price": 899.99}),
+        "Item": (Item, item, {"price": 899.99}),
+        "UserIn": (UserIn, {
+            "username": "jdoe",
+            "email": "john.doe@example.com",
+            "full_name": "John " + "Quincy " * (width // 10) + "Doe",
+            "password": "correct horse battery staple",
+        }, {"full_name": None}),
+        "FilterParams": (FilterParams, {
+            "tags": tags,
+            "price_min": 50,
+            "price_max": 500,
+            "limit": 50,
+            "order_by": "updated_at",
+        }, {"limit": 10}),
+        "Image": (Image, {"name": "front", "url": f"https://images.example.com/{'a' * width}/front.png"}, {"name": "back"}),
+    }
+
+
+def best_time(function, rounds : int, repeat : int) -> float:
+    """Fastest of `repeat` runs of `rounds` calls, in seconds per call"""
+    function()
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            function()
+        best = min(best, (time.perf_counter() - started) / rounds)
+    return best
+
+
+def measure(model, data : dict, update : dict, batch : int, rounds : int, repeat : int) -> dict:
+    instance = model.model_validate(data)
+    body = json.dumps(data).encode()
+    adapter = TypeAdapter(list[model])
+    many = [data] * batch
+    seconds = {
+        "validate": best_time(lambda: model.model_validate(data), rounds, repeat),
+        "validate_json": best_time(lambda: model.model_validate_json(body), rounds, repeat),
+        "validate_batch": best_time(lambda: adapter.validate_python(many), max(1, rounds // batch), repeat) / batch,
+        "dump": best_time(lambda: instance.model_dump(mode="json"), rounds, repeat),
+        "dump_json": best_time(lambda: instance.model_dump_json(), rounds, repeat),
+        "copy": best_time(lambda: instance.model_copy(update=update), rounds, repeat),
+    }
+    return {operation: value * 1e6 for operation, value in seconds.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--widths", default="0,20,200", help="comma separated payload widths")
+    parser.add_argument("--batch", type=int, default=1000, help="models per validate_batch call")
+    parser.add_argument("--rounds", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", help="regular expression selecting models by name")
+    baseline.add_arguments(parser, threshold=0.15)
+    args = parser.parse_args()
+
+    operations = ("validate", "validate_json", "validate_batch", "dump", "dump_json", "copy")
+    results = {}
+    print(f"{'model':<13} {'width':>5} " + " ".join(f"{operation:>14}" for operation in operations) + "   (us per model)")
+    for width in (int(width) for width in args.widths.split(",")):
+        for name, (model, data, update) in payloads(width).items():
+            if args.only and not re.search(args.only, name):
+                continue
+            micros = measure(model, data, update, args.batch, args.rounds, args.repeat)
+            results.update({f"{name}/w{width}/{operation}": micros[operation] for operation in operations})
+            print(f"{name:<13} {width:>5} " + " ".join(f"{micros[operation]:>14.2f}" for operation in operations))
+
+    baseline.finish(args, results, unit=" us")
+
+
+if __name__ == "__main__":
+    main()
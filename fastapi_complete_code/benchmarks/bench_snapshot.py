@@ -0,0 +1,66 @@
+"""
+Cold-start benchmark: write-ahead log replay vs. memory-mapped snapshot
+
+Builds a store of synthetic items, then measures how long a new
+ItemRepository takes to become ready to serve `get` when it has to replay
+the whole log, and when it opens a checkpointed snapshot instead.
+
+    python -m benchmarks.bench_snapshot --items 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from databases.item_repository import ItemRepository
+from databases.snapshot import SnapshotReader
+from databases.wal import WriteAheadLog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=200_000)
+    parser.add_argument("--reads", type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        wal_path = os.path.join(directory, "items.wal")
+        snapshot_path = os.path.join(directory, "items.snap")
+
+        store = ItemRepository(wal=WriteAheadLog(wal_path, durability="interval"))
+        for i in range(args.items):
+            store.put(f"item_{i}", {
+                "name": f"Item {i}",
+                "description": f"Description of item {i}",
+                "price": 50.0 + i % 1000,
+                "tax": 1.5,
+                "tags": [f"tag{i % 50}", f"group{i % 7}"],
+            })
+        store.close()
+        log_size = os.path.getsize(wal_path)
+        ids = [f"item_{random.randrange(args.items)}" for _ in range(args.reads)]
+
+        started = time.perf_counter()
+        replayed = ItemRepository(wal=WriteAheadLog(wal_path))
+        replay_seconds = time.perf_counter() - started
+        checkpointed = replayed.checkpoint(snapshot_path)
+        replayed.close()
+
+        started = time.perf_counter()
+        mapped = ItemRepository(wal=WriteAheadLog(wal_path), snapshot=SnapshotReader(snapshot_path))
+        open_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        for item_id in ids:
+            mapped.get(item_id)
+        read_seconds = time.perf_counter() - started
+        mapped.close()
+
+        print(f"{checkpointed} items, log {log_size:,} B, snapshot {os.path.getsize(snapshot_path):,} B")
+        print(f"log replay          {replay_seconds * 1000:10.1f} ms")
+        print(f"snapshot open       {open_seconds * 1000:10.3f} ms")
+        print(f"lazy get from mmap  {read_seconds / args.reads * 1e6:10.2f} us/read")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Startup benchmark: import cost and time to first response of main.py
+
+Starts fresh interpreters that import main.app and send it one request
+through benchmarks.asgi_client, with routers imported eagerly and with
+LAZY_ROUTERS=1, and reports the median over --runs of:
+
+    import      importing main
+    first       the first request (in lazy mode this includes loading its router)
+    total       process start to first response, as seen by this process
+
+--imports N also prints the N most expensive modules of one eager import,
+from `python -X importtime`: time spent in each module itself and
+including what it imported. --save-baseline / --baseline / --threshold
+(see benchmarks.baseline) store and compare the `total` medians, failing
+the run on a slowdown.
+
+    python -m benchmarks.bench_startup --runs 10 --imports 20
+    python -m benchmarks.bench_startup --path /users/seed --baseline bench-startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks import baseline
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import time
+started = time.perf_counter()
+import asyncio, json, sys
+import main
+imported = time.perf_counter()
+from benchmarks.asgi_client import request
+status, _ = asyncio.run(request(main.app, "GET", sys.argv[1]))
+print(json.dumps({"import": imported - started, "first": time.perf_counter() - imported, "status": status}), flush=True)
+"""
+
+
+def start_once(path : str, lazy : bool) -> dict:
+    env = {**os.environ, "LAZY_ROUTERS": "1" if lazy else "0", "PYTHONDONTWRITEBYTECODE": "1"}
+    started = time.perf_counter()
+    child = subprocess.Popen([sys.executable, "-c", CHILD, path], cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True)
+    line = child.stdout.readline()
+    total = time.perf_counter() - started
+    child.communicate()
+    if not line:
+        raise RuntimeError(f"startup failed with exit status {child.returncode}")
+    return {**json.loads(line), "total": total}
+
+
+def import_costs(limit : int) -> list[tuple[int, int, str]]:
+    """(self us, cumulative us, module) of the `limit` modules with the highest self time"""
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT,
+                            env={**os.environ, "LAZY_ROUTERS": "0"}, capture_output=True, text=True, check=True).stderr
+    costs = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, module = line[len("import time:"):].split("|")
+        costs.append((int(own), int(cumulative), module.strip()))
+    return sorted(costs, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/items/", help="path of the first request")
+    parser.add_argument("--imports", type=int, default=0, metavar="N", help="show the N most expensive imports")
+    baseline.add_arguments(parser, threshold=0.2)
+    args = parser.parse_args()
+
+    if args.imports:
+        print(f"{'self ms':>8} {'cumulative ms':>14}  module")
+        for own, cumulative, module in import_costs(args.imports):
+            print(f"{own / 1000:>8.1f} {cumulative / 1000:>14.1f}  {module}")
+        print()
+
+    results = {}
+    print(f"{'mode':<6} {'import ms':>10} {'first ms':>10} {'total ms':>10}   GET {args.path}")
+    for mode in ("eager", "lazy"):
+        runs = [start_once(args.path, mode == "lazy") for _ in range(args.runs)]
+        statuses = {run["status"] for run in runs}
+        medians = {key: statistics.median(run[key] for run in runs) * 1000 for key in ("import", "first", "total")}
+        results[mode] = medians["total"]
+        print(f"{mode:<6} {medians['import']:>10.1f} {medians['first']:>10.1f} {medians['total']:>10.1f}   status {', '.join(map(str, sorted(statuses)))}")
+
+    baseline.finish(args, results, unit=" ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,10 @@
+import os
+
+from databases.item_repository import ItemRepository
+from databases.snapshot import SnapshotReader
+from databases.user_repository import UserRepository
+from databases.wal import WriteAheadLog
+from serialization.response_cache import response_cache
 
 fake_item_db = [
     {"item_name": "Foo"},
@@ -26,3 +33,45 @@ items = {
     }
 }
 
+
+def open_item_wal() -> WriteAheadLog | None:
+    """
+    Write-ahead log for the item store, configured from the environment
+
+    ITEM_WAL_PATH turns persistence on; ITEM_WAL_DURABILITY is one of
+    always / batch / interval (default batch) and ITEM_WAL_INTERVAL the
+    fsync period in seconds for interval mode.
+    """
+    path = os.environ.get("ITEM_WAL_PATH")
+    if not path:
+        return None
+    wal = WriteAheadLog(
+        path,
+        durability=os.environ.get("ITEM_WAL_DURABILITY", "batch"),
+        interval=float(os.environ.get("ITEM_WAL_INTERVAL", "0.05")),
+    )
+    wal.start()
+    return wal
+
+
+def open_item_snapshot() -> SnapshotReader | None:
+    """Memory-mapped item snapshot named by ITEM_SNAPSHOT_PATH, if it exists yet"""
+    path = os.environ.get("ITEM_SNAPSHOT_PATH")
+    if not path or not os.path.exists(path):
+        return None
+    return SnapshotReader(path)
+
+
+def close_item_store():
+    """Checkpoint to ITEM_SNAPSHOT_PATH (when set) so the next start is fast, then close the log"""
+    snapshot_path = os.environ.get("ITEM_SNAPSHOT_PATH")
+    if snapshot_path:
+        item_store.checkpoint(snapshot_path)
+    item_store.close()
+
+
+# every item read and write goes through the repository so its indexes stay current
+item_store = ItemRepository(items, wal=open_item_wal(), snapshot=open_item_snapshot())
+item_store.add_listener(response_cache.invalidate)
+
+user_store = UserRepository()
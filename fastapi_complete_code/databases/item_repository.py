@@ -0,0 +1,599 @@
+import heapq
+import secrets
+import threading
+import time
+from collections import defaultdict
+from itertools import islice
+from operator import itemgetter
+
+from databases.range_index import RangeIndex
+from databases.snapshot import write_snapshot
+from databases.sorted_keys import SortedKeys
+from databases.tag_index import TagIndex
+
+ORDER_FIELDS = ("created_at", "updated_at")
+
+# written once to a new log, so that a log emptied by deletes and compaction still counts as started
+INIT_ENTRY = {"op": "init"}
+
+# a filter drives a listing page when it matches at most this many items per row of
+# the page; sorting its matches then stays a small multiple of the page size
+CANDIDATES_PER_ROW = 32
+
+
+def _price(record: dict) -> float | None:
+    return record.get("price")
+
+
+def _price_with_tax(record: dict) -> float | None:
+    price = record.get("price")
+    return None if price is None else price + (record.get("tax") or 0)
+
+
+def _in_range(value, low, high) -> bool:
+    return value is not None and (low is None or value >= low) and (high is None or value <= high)
+
+
+class ItemRepository:
+    """
+    In-memory item storage with secondary indexes
+
+    Items are stored as plain dicts keyed by item id, the same shape the
+    routers used to read straight out of `fake_db.items`. Every write keeps
+    the name, tag, price and price + tax indexes in step, so lookups other
+    than by id do not have to scan every item. Creation and last-update times are kept
+    beside the records (not inside them) in ordered indexes that back
+    keyset pagination through `page`.
+
+    Records are never changed once stored: every write publishes a new
+    dict together with a new version number, so `get` is a single dict
+    lookup that needs no lock and always sees a complete record. Writes to
+    one key are serialized by one of `stripes` locks, which is where
+    read-modify-write callbacks passed to `update` run; only the short
+    index maintenance afterwards takes the shared index lock. Index
+    queries (`query`, `page`) hold that lock while they collect ids.
+
+    With a write-ahead log, every write is appended to it (while the key's
+    stripe lock is held, so the log order matches the apply order for each
+    item) before it becomes visible, and the log is replayed on startup.
+    `initial` items are only loaded into a store that has never run
+    before: the first start logs an "init" marker, which compaction and
+    checkpoints keep, and any snapshot also means the store has run.
+
+    A memory-mapped `snapshot` (see databases/snapshot.py) can serve as the
+    starting state instead of a long log: `get` decodes snapshot rows on
+    demand, and they are only loaded into the in-memory indexes the first
+    time an index query needs them. `checkpoint` writes a new snapshot and
+    starts a fresh log.
+
+    Dicts returned by `get` and `query` are the stored records and must be
+    treated as read-only; use `put` / `update` / `patch` to change an item.
+    """
+
+    def __init__(self, initial: dict[str, dict] | None = None, stripes: int = 64, wal=None, snapshot=None):
+        self._records: dict[str, tuple[int, dict]] = {}  # item_id -> (version, record)
+        self._sequence = 0
+        self.epoch = secrets.token_hex(4)  # versions restart with every process; this tells them apart
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        self._index_lock = threading.Lock()
+        self._by_name: dict[str, set[str]] = defaultdict(set)
+        self._by_tag = TagIndex()
+        self._by_price = RangeIndex()
+        self._by_price_with_tax = RangeIndex()
+        self._timestamps: dict[str, tuple[float, float]] = {}  # item_id -> (created_at, updated_at)
+        self._ordered: dict[str, SortedKeys] = {field: SortedKeys() for field in ORDER_FIELDS}  # (timestamp, item_id)
+
+        self._base = snapshot
+        self._shadowed: set[str] = set()  # snapshot rows overwritten or deleted since it was opened
+        self._listeners = []
+
+        self._wal = None
+        self._initialized = snapshot is not None
+        if wal is not None:
+            wal.replay(self._apply_logged)
+        self._wal = wal
+
+        if not self._initialized:
+            for item_id, data in (initial or {}).items():
+                self.put(item_id, data)
+            if wal is not None:
+                wal.append(INIT_ENTRY)
+            self._initialized = True
+
+    def add_listener(self, callback):
+        """Call `callback(item_id)` after every write or delete of an item, e.g. to drop cached copies"""
+        self._listeners.append(callback)
+
+    def close(self):
+        if self._wal is not None:
+            self._wal.close()
+
+    def __contains__(self, item_id: str) -> bool:
+        return self.get_versioned(item_id) is not None
+
+    def __len__(self) -> int:
+        base = self._base
+        return len(self._records) + (len(base) - len(self._shadowed) if base is not None else 0)
+
+    def get(self, item_id: str) -> dict | None:
+        entry = self.get_versioned(item_id)
+        return None if entry is None else entry[1]
+
+    def get_versioned(self, item_id: str) -> tuple[int, dict] | None:
+        """
+        Return (version, record); the version changes on every write to the item
+
+        Items still served from the snapshot have version 0.
+        """
+        # lock-free: the snapshot is read first because _load_base moves its rows
+        # into _records before dropping it, and a write stores the record before
+        # marking the snapshot row as shadowed, so a row found neither in memory
+        # nor (unshadowed) in the snapshot may just have moved: look once more.
+        base = self._base
+        entry = self._records.get(item_id)
+        if entry is not None:
+            return entry
+        row = self._base_row(item_id, base)
+        if row is not None:
+            return 0, base.read(row)[0]
+        return self._records.get(item_id)
+
+    def checkpoint(self, path: str) -> int:
+        """
+        Write every item to a snapshot at `path` and restart the log empty
+
+        Writers are paused only while the in-memory items are collected and
+        the log is rotated. The snapshot is written afterwards by merging
+        them, in id order, with the rows of the current snapshot that were
+        not overwritten, which are read straight from it rather than loaded
+        into the indexes. Returns the number of items written.
+        """
+        for stripe in self._stripes:
+            stripe.acquire()
+        try:
+            with self._index_lock:
+                rows = sorted(
+                    ((item_id, record, *self._timestamps[item_id]) for item_id, (_, record) in self._records.items()),
+                    key=itemgetter(0),
+                )
+                base, shadowed = self._base, set(self._shadowed)
+            if self._wal is not None:
+                self._wal.rotate()
+                self._wal.append(INIT_ENTRY)
+        finally:
+            for stripe in self._stripes:
+                stripe.release()
+
+        if base is not None:
+            # the old snapshot is mapped, so replacing its file below does not disturb reading it
+            base_rows = (
+                (item_id, *base.read(row))
+                for row in range(len(base))
+                if (item_id := base.item_id(row)) not in shadowed
+            )
+            rows = heapq.merge(rows, base_rows, key=itemgetter(0))
+        written = write_snapshot(path, rows, presorted=True)
+        if self._wal is not None:
+            self._wal.finish_rotation()
+        return written
+
+    def put(self, item_id: str, data: dict) -> dict:
+        """Insert or replace an item and return the stored record"""
+        with self._stripe(item_id):
+            return self._write(item_id, dict(data))
+
+    def update(self, item_id: str, apply) -> dict | None:
+        """
+        Replace an item with `apply(current_record)` atomically for that key
+
+        `apply` runs under the key's stripe lock, so concurrent updates of the
+        same item cannot lose each other's changes. It must return a new dict
+        rather than modify the one it is given. Returns None if the item does
+        not exist.
+        """
+        with self._stripe(item_id):
+            entry = self.get_versioned(item_id)
+            if entry is None:
+                return None
+            return self._write(item_id, apply(entry[1]))
+
+    def patch(self, item_id: str, changes: dict) -> dict | None:
+        """Merge `changes` into an existing item, or return None if it does not exist"""
+        return self.update(item_id, lambda previous: {**previous, **changes})
+
+    def write_many(self, writes) -> list[dict | None]:
+        """
+        Apply a batch of `(item_id, apply)` writes with a single log append
+
+        `apply(current_record_or_None)` returns the new record, or None to
+        leave that item as it is. Writes run in order, so a later write to an
+        id sees the result of an earlier one, and all of them run under the
+        stripe locks of every id in the batch. With a write-ahead log the
+        whole batch shares one append and therefore one fsync. Returns the
+        stored record (or None) for each write.
+        """
+        stripes = sorted({hash(item_id) % len(self._stripes) for item_id, _ in writes})
+        for stripe in stripes:
+            self._stripes[stripe].acquire()
+        try:
+            now = time.time()
+            batch: dict[str, tuple[dict, float]] = {}  # item_id -> (record, created_at) written so far
+            results = []
+            publishes = []
+            for item_id, apply in writes:
+                if item_id in batch:
+                    current, created_at = batch[item_id]
+                else:
+                    current, created_at = self.get(item_id), self._created_at(item_id)
+                record = apply(current)
+                results.append(record)
+                if record is None:
+                    continue
+                created_at = now if created_at is None else created_at
+                batch[item_id] = (record, created_at)
+                publishes.append((item_id, record, created_at))
+
+            if self._wal is not None and publishes:
+                self._wal.append_many([
+                    {"op": "put", "id": item_id, "item": record, "created_at": created_at, "updated_at": now}
+                    for item_id, record, created_at in publishes
+                ])
+            for item_id, record, created_at in publishes:
+                self._publish(item_id, record, created_at, now)
+            return results
+        finally:
+            for stripe in reversed(stripes):
+                self._stripes[stripe].release()
+
+    def delete(self, item_id: str) -> bool:
+        with self._stripe(item_id):
+            if item_id not in self:
+                return False
+            if self._wal is not None:
+                self._wal.append({"op": "delete", "id": item_id})
+            self._remove(item_id)
+            return True
+
+    def _stripe(self, item_id: str) -> threading.Lock:
+        return self._stripes[hash(item_id) % len(self._stripes)]
+
+    def _write(self, item_id: str, record: dict) -> dict:
+        # caller holds the stripe lock, so this key's timestamps cannot change under us
+        now = time.time()
+        created_at = self._created_at(item_id)
+        if created_at is None:
+            created_at = now
+        if self._wal is not None:
+            self._wal.append({"op": "put", "id": item_id, "item": record, "created_at": created_at, "updated_at": now})
+        return self._publish(item_id, record, created_at, now)
+
+    def _created_at(self, item_id: str) -> float | None:
+        base = self._base
+        timestamps = self._timestamps.get(item_id)
+        if timestamps is not None:
+            return timestamps[0]
+        row = self._base_row(item_id, base)
+        return None if row is None else base.read(row)[1]
+
+    def _apply_logged(self, entry: dict):
+        # logs written before the init marker existed still start with the seed items
+        self._initialized = True
+        if entry["op"] == "init":
+            return
+        if entry["op"] == "delete":
+            self._remove(entry["id"])
+        else:
+            self._publish(entry["id"], entry["item"], entry["created_at"], entry["updated_at"])
+
+    def _publish(self, item_id: str, record: dict, created_at: float, updated_at: float) -> dict:
+        with self._index_lock:
+            previous = self._records.get(item_id)
+            if previous is not None:
+                self._unindex(item_id, previous[1])
+            shadows = previous is None and self._base_row(item_id) is not None
+            self._sequence += 1
+            self._records[item_id] = (self._sequence, record)
+            if shadows:
+                # only now that the record is readable (see get_versioned)
+                self._shadowed.add(item_id)
+            self._index(item_id, record)
+            self._touch(item_id, created_at, updated_at)
+        self._notify(item_id)
+        return record
+
+    def _remove(self, item_id: str):
+        with self._index_lock:
+            entry = self._records.pop(item_id, None)
+            if entry is None:
+                if self._base_row(item_id) is not None:
+                    self._shadowed.add(item_id)
+            else:
+                self._unindex(item_id, entry[1])
+                created_at, updated_at = self._timestamps.pop(item_id)
+                self._ordered["created_at"].remove((created_at, item_id))
+                self._ordered["updated_at"].remove((updated_at, item_id))
+        self._notify(item_id)
+
+    def _notify(self, item_id: str):
+        for callback in self._listeners:
+            callback(item_id)
+
+    def query(
+        self,
+        name: str | None = None,
+        tags: list[str] | None = None,
+        price_min: float | None = None,
+        price_max: float | None = None,
+        price_with_tax_min: float | None = None,
+        price_with_tax_max: float | None = None,
+    ) -> list[tuple[str, dict]]:
+        """
+        Return (item_id, item) pairs matching every given condition
+
+        Args:
+            name: Exact item name
+            tags: Items must carry all of these tags
+            price_min: Inclusive lower bound on price
+            price_max: Inclusive upper bound on price
+            price_with_tax_min: Inclusive lower bound on price + tax
+            price_with_tax_max: Inclusive upper bound on price + tax
+        """
+        with self._index_lock:
+            self._load_base()
+            filters = self._filters(tags, price_min, price_max, price_with_tax_min, price_with_tax_max)
+            if name is not None:
+                named = self._by_name.get(name, set())
+                filters.append((len(named), lambda: named, lambda item_id, record: item_id in named))
+
+            if not filters:
+                return [(item_id, entry[1]) for item_id, entry in self._records.items()]
+
+            filters.sort(key=itemgetter(0))
+            _, candidates, _ = filters[0]
+            checks = [check for _, _, check in filters[1:]]
+            matches = []
+            for item_id in candidates():
+                record = self._records[item_id][1]
+                if all(check(item_id, record) for check in checks):
+                    matches.append((item_id, record))
+            return matches
+
+    def page(
+        self,
+        order_by: str = "created_at",
+        limit: int = 100,
+        after: tuple[float, str] | None = None,
+        offset: int = 0,
+        tags: list[str] | None = None,
+        price_min: float | None = None,
+        price_max: float | None = None,
+        price_with_tax_min: float | None = None,
+        price_with_tax_max: float | None = None,
+    ) -> tuple[list[tuple[str, dict]], tuple[float, str] | None]:
+        """
+        Walk items in `order_by` order, starting just past the key `after`
+
+        Returns the page of (item_id, item) pairs and the key of its last
+        entry, which is passed back as `after` to fetch the next page; the key
+        is None once the listing is exhausted. Seeking to `after` is a binary
+        search, so deep pages cost the same as the first one. `offset` is only
+        applied when no `after` key is given.
+
+        Filters (same meaning as in `query`) are planned from the index
+        sizes: when the most selective one matches at most
+        CANDIDATES_PER_ROW * `limit` items, the page is cut from its
+        matches; otherwise the ordered index is walked and each item is
+        checked, which stops as soon as the page is full. Either way the
+        work per page is bounded by the page size, not the match count.
+        """
+        with self._index_lock:
+            self._load_base()
+            index = self._ordered[order_by]
+            position = offset if after is None else index.bisect_right(after)
+            filters = self._filters(tags, price_min, price_max, price_with_tax_min, price_with_tax_max)
+
+            if not filters:
+                # one extra key tells us whether another page exists
+                keys = list(islice(index.iter_from(position), limit + 1))
+                page_keys = keys[:limit]
+                entries = [(item_id, self._records[item_id][1]) for _, item_id in page_keys]
+                last_key = page_keys[-1] if len(keys) > limit else None
+                return entries, last_key
+
+            filters.sort(key=itemgetter(0))
+            estimate, candidates, _ = filters[0]
+            checks = [check for _, _, check in filters[1:]]
+            if estimate <= CANDIDATES_PER_ROW * limit:
+                return self._page_from_candidates(order_by, limit, after, offset, candidates(), checks)
+
+            checks.append(filters[0][2])
+            skip = 0 if after is not None else offset
+            position = 0 if after is None else position
+            return self._walk_page(index, position, skip, limit, checks)
+
+    def scan(self, chunk_size: int = 1000, **filters):
+        """
+        Yield every item matching `filters` (as in `page`) in creation order, in lists of up to `chunk_size` pairs
+
+        When the most selective filter matches few enough items to drive a
+        page of `chunk_size`, its matches are collected and sorted once and
+        the scan slices them; each item is checked again against its current
+        record as it is yielded. Otherwise each chunk is one `page` call,
+        which walks the ordered index onward from the previous chunk. Either
+        way the whole scan is linear, and the index lock is only held while
+        keys or one chunk are collected, so writers keep going in between.
+        Items that are written or deleted while the scan runs may or may not
+        show up in their new state.
+        """
+        with self._index_lock:
+            self._load_base()
+            active = self._filters(**filters)
+            active.sort(key=itemgetter(0))
+            keys = None
+            if active and active[0][0] <= CANDIDATES_PER_ROW * chunk_size:
+                keys = [(self._timestamps[item_id][0], item_id) for item_id in active[0][1]()]
+
+        if keys is not None:
+            keys.sort()
+            checks = [check for _, _, check in active]
+            for start in range(0, len(keys), chunk_size):
+                entries = []
+                for _, item_id in keys[start:start + chunk_size]:
+                    entry = self._records.get(item_id)
+                    if entry is not None and all(check(item_id, entry[1]) for check in checks):
+                        entries.append((item_id, entry[1]))
+                if entries:
+                    yield entries
+            return
+
+        after = None
+        while True:
+            entries, after = self.page(order_by="created_at", limit=chunk_size, after=after, **filters)
+            if entries:
+                yield entries
+            if after is None:
+                return
+
+    def _filters(self, tags=None, price_min=None, price_max=None, price_with_tax_min=None, price_with_tax_max=None) -> list:
+        """
+        One (estimated matches, candidate ids, check) triple per active filter
+
+        Estimates are cheap (posting list length, bisect counts); candidate
+        ids are only materialized for the filter chosen to drive a query.
+        """
+        filters = []
+        if tags:
+            wanted = set(tags)
+            filters.append((
+                min(self._by_tag.count(tag) for tag in wanted),
+                lambda: self._by_tag.intersect(wanted),
+                lambda item_id, record: wanted.issubset(record.get("tags") or ()),
+            ))
+        for index, value_of, low, high in (
+            (self._by_price, _price, price_min, price_max),
+            (self._by_price_with_tax, _price_with_tax, price_with_tax_min, price_with_tax_max),
+        ):
+            if low is None and high is None:
+                continue
+            filters.append((
+                index.count(low, high),
+                lambda index=index, low=low, high=high: index.range(low, high),
+                lambda item_id, record, value_of=value_of, low=low, high=high: _in_range(value_of(record), low, high),
+            ))
+        return filters
+
+    def _page_from_candidates(self, order_by, limit, after, offset, candidates, checks):
+        slot = ORDER_FIELDS.index(order_by)
+        keys = (
+            (self._timestamps[item_id][slot], item_id)
+            for item_id in candidates
+            if all(check(item_id, self._records[item_id][1]) for check in checks)
+        )
+        if after is not None:
+            keys = (key for key in keys if key > after)
+
+        # one extra key tells us whether another page exists
+        wanted = (0 if after is not None else offset) + limit + 1
+        keys = heapq.nsmallest(wanted, keys)
+        if after is None:
+            keys = keys[offset:]
+
+        page_keys = keys[:limit]
+        entries = [(item_id, self._records[item_id][1]) for _, item_id in page_keys]
+        last_key = page_keys[-1] if len(keys) > limit else None
+        return entries, last_key
+
+    def _walk_page(self, index, position, skip, limit, checks):
+        entries = []
+        last_key = None
+        keys = index.iter_from(position)
+        for key in keys:
+            record = self._records[key[1]][1]
+            if not all(check(key[1], record) for check in checks):
+                continue
+            if skip:
+                skip -= 1
+                continue
+            entries.append((key[1], record))
+            last_key = key
+            if len(entries) == limit:
+                break
+
+        if next(keys, None) is None:
+            last_key = None
+        return entries, last_key
+
+    def _base_row(self, item_id: str, base=None) -> int | None:
+        if base is None:
+            base = self._base
+        if base is None or item_id in self._shadowed:
+            return None
+        return base.find(item_id)
+
+    def _load_base(self):
+        # index lock held: move every live snapshot row into the indexed in-memory store.
+        # The sorted indexes get all rows' keys in one sort each; adding rows one
+        # by one would be quadratic at millions of items.
+        base = self._base
+        if base is None:
+            return
+        created, updated, prices, prices_with_tax = [], [], [], []
+        for row in range(len(base)):
+            item_id = base.item_id(row)
+            if item_id in self._shadowed:
+                continue
+            record, created_at, updated_at = base.read(row)
+            self._records[item_id] = (0, record)
+            self._timestamps[item_id] = (created_at, updated_at)
+            created.append((created_at, item_id))
+            updated.append((updated_at, item_id))
+            if record.get("name") is not None:
+                self._by_name[record["name"]].add(item_id)
+            if record.get("tags"):
+                self._by_tag.add(item_id, record["tags"])
+            if record.get("price") is not None:
+                prices.append((_price(record), item_id))
+                prices_with_tax.append((_price_with_tax(record), item_id))
+        self._ordered["created_at"].update(created)
+        self._ordered["updated_at"].update(updated)
+        self._by_price.add_many(prices)
+        self._by_price_with_tax.add_many(prices_with_tax)
+        self._base = None
+
+    def _touch(self, item_id: str, created_at: float, updated_at: float):
+        previous = self._timestamps.get(item_id)
+        if previous is None:
+            self._ordered["created_at"].add((created_at, item_id))
+        else:
+            created_at = previous[0]
+            self._ordered["updated_at"].remove((previous[1], item_id))
+        self._ordered["updated_at"].add((updated_at, item_id))
+        self._timestamps[item_id] = (created_at, updated_at)
+
+    def _index(self, item_id: str, record: dict):
+        if record.get("name") is not None:
+            self._by_name[record["name"]].add(item_id)
+        if record.get("tags"):
+            self._by_tag.add(item_id, record["tags"])
+        if record.get("price") is not None:
+            self._by_price.add(_price(record), item_id)
+            self._by_price_with_tax.add(_price_with_tax(record), item_id)
+
+    def _unindex(self, item_id: str, record: dict):
+        name = record.get("name")
+        if name is not None:
+            self._discard(self._by_name, name, item_id)
+        if record.get("tags"):
+            self._by_tag.remove(item_id, record["tags"])
+        if record.get("price") is not None:
+            self._by_price.remove(_price(record), item_id)
+            self._by_price_with_tax.remove(_price_with_tax(record), item_id)
+
+    @staticmethod
+    def _discard(index: dict[str, set[str]], key: str, item_id: str):
+        ids = index.get(key)
+        if ids is None:
+            return
+        ids.discard(item_id)
+        if not ids:
+            del index[key]
@@ -0,0 +1,46 @@
+from itertools import islice
+from operator import itemgetter
+
+from databases.sorted_keys import SortedKeys
+
+_value = itemgetter(0)
+
+
+class RangeIndex:
+    """
+    Sorted (value, item_id) pairs for inclusive range lookups
+
+    Both bounds are found with bisect, so counting the matches of a range
+    is O(log n) plus a sum over the buckets of a SortedKeys, and listing
+    them costs only the size of the answer. Writes shift one bucket rather
+    than the whole index.
+    """
+
+    def __init__(self):
+        self._keys = SortedKeys()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, value: float, item_id: str):
+        self._keys.add((value, item_id))
+
+    def add_many(self, pairs):
+        """Add (value, item_id) pairs in bulk, sorting once"""
+        self._keys.update(pairs)
+
+    def remove(self, value: float, item_id: str):
+        self._keys.remove((value, item_id))
+
+    def count(self, low: float | None = None, high: float | None = None) -> int:
+        start, stop = self._bounds(low, high)
+        return max(stop - start, 0)
+
+    def range(self, low: float | None = None, high: float | None = None) -> list[str]:
+        start, stop = self._bounds(low, high)
+        return [item_id for _, item_id in islice(self._keys.iter_from(start), max(stop - start, 0))]
+
+    def _bounds(self, low, high) -> tuple[int, int]:
+        start = 0 if low is None else self._keys.bisect_left(low, key=_value)
+        stop = len(self._keys) if high is None else self._keys.bisect_right(high, key=_value)
+        return start, stop
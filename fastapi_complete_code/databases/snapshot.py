@@ -0,0 +1,197 @@
+import json
+import mmap
+import os
+import struct
+from array import array
+
+MAGIC = b"ITEMSNAP"
+FORMAT_VERSION = 1
+NO_STRING = 0xFFFFFFFF
+
+# magic, format version, row count, then byte offsets of the tag refs,
+# string offsets and string data sections (rows start right after the header)
+HEADER = struct.Struct("<8sIQQQQ")
+
+# price, tax, created_at, updated_at, then string indexes for id, name,
+# description, image, timestamp and a JSON blob of any other keys, the
+# first index into the tag refs section and how many tags follow, and
+# two bitmasks over OPTIONAL_FIELDS: key present in the record, value null
+ROW = struct.Struct("<ddddIIIIIIIIHH")
+
+OPTIONAL_FIELDS = ("name", "description", "price", "tags", "image", "tax", "timestamp")
+STRING_FIELDS = ("name", "description", "image", "timestamp")
+
+
+def write_snapshot(path : str, rows, presorted : bool = False) -> int:
+    """
+    Write (item_id, record, created_at, updated_at) rows as a snapshot file
+
+    Rows are sorted by item id so readers can binary search them; with
+    `presorted` they are taken to be in that order already and are
+    consumed one at a time, so they may come from a generator. Strings
+    (ids, names, descriptions, tags, ...) are stored once each in a shared
+    string table. The file is written next to `path` and renamed into place.
+    Returns the number of rows written.
+    """
+    if not presorted:
+        rows = sorted(rows, key=lambda row: row[0])
+    count = 0
+    strings : dict[str, int] = {}
+    string_data = bytearray()
+    string_offsets = array("Q", [0])
+    tag_refs = array("I")
+
+    def intern(value):
+        if value is None:
+            return NO_STRING
+        index = strings.get(value)
+        if index is None:
+            index = strings[value] = len(string_offsets) - 1
+            string_data.extend(value.encode())
+            string_offsets.append(len(string_data))
+        return index
+
+    packed_rows = bytearray()
+    for item_id, record, created_at, updated_at in rows:
+        count += 1
+        present = null = 0
+        for bit, field in enumerate(OPTIONAL_FIELDS):
+            if field in record:
+                present |= 1 << bit
+                if record[field] is None:
+                    null |= 1 << bit
+
+        tags = record.get("tags") or []
+        tags_start = len(tag_refs)
+        tag_refs.extend(intern(tag) for tag in tags)
+        extra = {key: value for key, value in record.items() if key not in OPTIONAL_FIELDS}
+
+        packed_rows += ROW.pack(
+            float(record.get("price") or 0.0),
+            float(record.get("tax") or 0.0),
+            created_at,
+            updated_at,
+            intern(item_id),
+            *(intern(_as_string(record.get(field))) for field in STRING_FIELDS),
+            intern(json.dumps(extra, separators=(",", ":")) if extra else None),
+            tags_start,
+            len(tags),
+            present,
+            null,
+        )
+
+    tag_refs_offset = HEADER.size + len(packed_rows)
+    string_offsets_offset = tag_refs_offset + tag_refs.itemsize * len(tag_refs)
+    string_data_offset = string_offsets_offset + string_offsets.itemsize * len(string_offsets)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as snapshot_file:
+        snapshot_file.write(HEADER.pack(
+            MAGIC, FORMAT_VERSION, count, tag_refs_offset, string_offsets_offset, string_data_offset
+        ))
+        snapshot_file.write(packed_rows)
+        snapshot_file.write(tag_refs.tobytes())
+        snapshot_file.write(string_offsets.tobytes())
+        snapshot_file.write(string_data)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+    os.replace(tmp_path, path)
+    return count
+
+
+def _as_string(value):
+    return None if value is None else str(value)
+
+
+class SnapshotReader:
+    """
+    Read-only, memory-mapped view of a snapshot file
+
+    Opening a snapshot only maps the file and reads the header; nothing is
+    decoded up front. `find` binary searches the sorted rows, decoding just
+    the ids it compares, and `read` builds the record dict for one row when
+    it is asked for. Because the mapping is read-only and shared, processes
+    serving the same snapshot share its pages in the OS page cache.
+    """
+
+    def __init__(self, path : str):
+        self.path = path
+        with open(path, "rb") as snapshot_file:
+            self._map = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, tag_refs_offset, string_offsets_offset, string_data_offset = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not an item snapshot (format {FORMAT_VERSION})")
+
+        self._count = count
+        self._tag_refs = memoryview(self._map)[tag_refs_offset:string_offsets_offset].cast("I")
+        self._string_offsets = memoryview(self._map)[string_offsets_offset:string_data_offset].cast("Q")
+        self._string_data = string_data_offset
+
+    def __len__(self) -> int:
+        return self._count
+
+    def find(self, item_id : str) -> int | None:
+        """Return the row number of `item_id`, or None if the snapshot does not have it"""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            current = self._row_id(middle)
+            if current < item_id:
+                low = middle + 1
+            elif current > item_id:
+                high = middle
+            else:
+                return middle
+        return None
+
+    def get(self, item_id : str) -> tuple[dict, float, float] | None:
+        row = self.find(item_id)
+        return None if row is None else self.read(row)
+
+    def read(self, row : int) -> tuple[dict, float, float]:
+        """Decode one row into (record, created_at, updated_at)"""
+        (price, tax, created_at, updated_at, _, name, description, image, timestamp, extra,
+         tags_start, tags_count, present, null) = ROW.unpack_from(self._map, HEADER.size + row * ROW.size)
+
+        values = {
+            "name": name,
+            "description": description,
+            "image": image,
+            "timestamp": timestamp,
+            "price": price,
+            "tax": tax,
+        }
+        record = {}
+        for bit, field in enumerate(OPTIONAL_FIELDS):
+            if not present & (1 << bit):
+                continue
+            if null & (1 << bit):
+                record[field] = None
+            elif field == "tags":
+                refs = self._tag_refs[tags_start:tags_start + tags_count]
+                record[field] = [self._string(index) for index in refs]
+            elif field in STRING_FIELDS:
+                record[field] = self._string(values[field])
+            else:
+                record[field] = values[field]
+        if extra != NO_STRING:
+            record.update(json.loads(self._string(extra)))
+        return record, created_at, updated_at
+
+    def item_id(self, row : int) -> str:
+        return self._row_id(row)
+
+    def close(self):
+        self._tag_refs.release()
+        self._string_offsets.release()
+        self._map.close()
+
+    def _row_id(self, row : int) -> str:
+        index = struct.unpack_from("<I", self._map, HEADER.size + row * ROW.size + 32)[0]
+        return self._string(index)
+
+    def _string(self, index : int) -> str:
+        start = self._string_data + self._string_offsets[index]
+        end = self._string_data + self._string_offsets[index + 1]
+        return self._map[start:end].decode()
@@ -0,0 +1,103 @@
+from bisect import bisect_left, bisect_right, insort
+from itertools import chain, islice
+
+
+class SortedKeys:
+    """
+    Sorted sequence of unique keys, stored as a list of bounded buckets
+
+    A single sorted Python list pays an O(n) memmove on every insert and
+    delete, which at millions of keys means shifting megabytes per write.
+    Here each bucket holds at most 2 * `load` keys in order, buckets follow
+    each other in order, and `_maxes` keeps the last key of every bucket:
+    an insert or delete bisects `_maxes`, then shifts within one bucket.
+    Positions (for counts and offsets) are found by adding up the bucket
+    lengths before a key, which costs O(number of buckets).
+
+    `update` adds many keys with one sort, for bulk loads.
+    """
+
+    def __init__(self, keys=(), load : int = 1000):
+        self.load = load
+        self._rebuild(sorted(keys))
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self):
+        return chain.from_iterable(self._buckets)
+
+    def add(self, key):
+        if not self._buckets:
+            self._buckets.append([key])
+            self._maxes.append(key)
+        else:
+            bucket = bisect_left(self._maxes, key)
+            if bucket == len(self._buckets):
+                bucket -= 1
+                self._buckets[bucket].append(key)
+                self._maxes[bucket] = key
+            else:
+                insort(self._buckets[bucket], key)
+            if len(self._buckets[bucket]) > 2 * self.load:
+                self._split(bucket)
+        self._len += 1
+
+    def remove(self, key) -> bool:
+        """Remove `key`; returns False if it was not there"""
+        bucket = bisect_left(self._maxes, key)
+        if bucket == len(self._buckets):
+            return False
+        keys = self._buckets[bucket]
+        position = bisect_left(keys, key)
+        if position == len(keys) or keys[position] != key:
+            return False
+        del keys[position]
+        self._len -= 1
+        if not keys:
+            del self._buckets[bucket]
+            del self._maxes[bucket]
+        elif position == len(keys):
+            self._maxes[bucket] = keys[-1]
+        return True
+
+    def update(self, keys):
+        """Add many keys at once: one sort of everything instead of an insert per key"""
+        self._rebuild(sorted(chain(self, keys)))
+
+    def bisect_left(self, value, key=None) -> int:
+        bucket = bisect_left(self._maxes, value, key=key)
+        if bucket == len(self._buckets):
+            return self._len
+        return self._position(bucket) + bisect_left(self._buckets[bucket], value, key=key)
+
+    def bisect_right(self, value, key=None) -> int:
+        bucket = bisect_right(self._maxes, value, key=key)
+        if bucket == len(self._buckets):
+            return self._len
+        return self._position(bucket) + bisect_right(self._buckets[bucket], value, key=key)
+
+    def iter_from(self, position : int = 0):
+        """Iterate over the keys from `position` on; the keys must not change meanwhile"""
+        for keys in self._buckets:
+            if position >= len(keys):
+                position -= len(keys)
+                continue
+            yield from islice(keys, position, None)
+            position = 0
+
+    def _position(self, bucket : int) -> int:
+        return sum(map(len, islice(self._buckets, bucket)))
+
+    def _split(self, bucket : int):
+        keys = self._buckets[bucket]
+        upper = keys[self.load:]
+        del keys[self.load:]
+        self._buckets.insert(bucket + 1, upper)
+        self._maxes[bucket] = keys[-1]
+        self._maxes.insert(bucket + 1, upper[-1])
+
+    def _rebuild(self, keys : list):
+        self._buckets = [keys[start:start + self.load] for start in range(0, len(keys), self.load)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._len = len(keys)
@@ -0,0 +1,96 @@
+from array import array
+from bisect import bisect_left, insort
+
+
+class TagIndex:
+    """
+    Inverted index from tag to the items carrying it
+
+    Each item id is mapped once to a small integer ordinal, and every tag
+    keeps a sorted `array` of ordinals (8 bytes per entry rather than a set
+    of strings). A multi-tag lookup starts from the shortest posting list
+    and probes the others with binary search, so its cost follows the
+    rarest tag instead of the size of the catalog.
+
+    `remove` is given every tag the item was added with, so afterwards the
+    item is in no posting list: its ordinal is released and handed to the
+    next new item, and churn does not grow the maps.
+    """
+
+    def __init__(self):
+        self._ordinals: dict[str, int] = {}
+        self._item_ids: list[str | None] = []
+        self._free: list[int] = []  # released ordinals
+        self._postings: dict[str, array] = {}
+
+    def __len__(self) -> int:
+        return len(self._postings)
+
+    def count(self, tag: str) -> int:
+        postings = self._postings.get(tag)
+        return 0 if postings is None else len(postings)
+
+    def add(self, item_id: str, tags) -> None:
+        ordinal = self._ordinal(item_id)
+        for tag in set(tags):
+            postings = self._postings.get(tag)
+            if postings is None:
+                self._postings[tag] = array("q", [ordinal])
+            elif postings[-1] < ordinal:
+                postings.append(ordinal)
+            else:
+                position = bisect_left(postings, ordinal)
+                if position == len(postings) or postings[position] != ordinal:
+                    insort(postings, ordinal)
+
+    def remove(self, item_id: str, tags) -> None:
+        ordinal = self._ordinals.pop(item_id, None)
+        if ordinal is None:
+            return
+        self._item_ids[ordinal] = None
+        self._free.append(ordinal)
+        for tag in set(tags):
+            postings = self._postings.get(tag)
+            if postings is None:
+                continue
+            position = bisect_left(postings, ordinal)
+            if position < len(postings) and postings[position] == ordinal:
+                del postings[position]
+            if not postings:
+                del self._postings[tag]
+
+    def intersect(self, tags) -> list[str]:
+        """Return the ids of items that carry every tag in `tags`"""
+        postings = []
+        for tag in set(tags):
+            tagged = self._postings.get(tag)
+            if tagged is None:
+                return []
+            postings.append(tagged)
+        if not postings:
+            return []
+
+        postings.sort(key=len)
+        matches = postings[0]
+        for other in postings[1:]:
+            matches = [ordinal for ordinal in matches if self._contains(other, ordinal)]
+            if not matches:
+                return []
+        return [self._item_ids[ordinal] for ordinal in matches]
+
+    def _ordinal(self, item_id: str) -> int:
+        ordinal = self._ordinals.get(item_id)
+        if ordinal is None:
+            if self._free:
+                ordinal = self._free.pop()
+                self._item_ids[ordinal] = item_id
+            else:
+                ordinal = len(self._item_ids)
+                self._item_ids.append(item_id)
+            self._ordinals[item_id] = ordinal
+        return ordinal
+
+    @staticmethod
+    def _contains(postings: array, ordinal: int) -> bool:
+        position = bisect_left(postings, ordinal)
+        return position < len(postings) and postings[position] == ordinal
@@ -0,0 +1,77 @@
+import threading
+
+
+class DuplicateUser(ValueError):
+    def __init__(self, field : str):
+        super().__init__(f"A user with this {field} already exists")
+        self.field = field
+
+
+def email_key(email : str) -> str:
+    return email.casefold()
+
+
+class UserRepository:
+    """
+    In-memory user accounts with unique usernames and emails
+
+    Records are dicts shaped like `UserInDB`, stored by username, with a
+    second hash index from the case-folded email to the username, so both
+    uniqueness checks are single dict lookups. Writes take one lock; the
+    check and the insert happen under it, so two concurrent signups for the
+    same name cannot both succeed.
+    """
+
+    def __init__(self):
+        self._users : dict[str, dict] = {}
+        self._by_email : dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def get(self, username : str) -> dict | None:
+        return self._users.get(username)
+
+    def get_by_email(self, email : str) -> dict | None:
+        username = self._by_email.get(email_key(email))
+        return None if username is None else self._users.get(username)
+
+    def conflict(self, username : str, email : str) -> str | None:
+        """Name of the unique field ("username" / "email") an account would clash on, if any"""
+        if username in self._users:
+            return "username"
+        if email_key(email) in self._by_email:
+            return "email"
+        return None
+
+    def add(self, user : dict) -> dict:
+        """Store a new account or raise DuplicateUser"""
+        with self._lock:
+            self._insert(user)
+        return user
+
+    def add_many(self, users : list[dict]) -> list[str | None]:
+        """
+        Store several accounts under one lock acquisition
+
+        Returns, per account, None when it was stored or the name of the
+        field it clashed on (with an existing account or an earlier one in
+        the same call).
+        """
+        results = []
+        with self._lock:
+            for user in users:
+                try:
+                    self._insert(user)
+                    results.append(None)
+                except DuplicateUser as e:
+                    results.append(e.field)
+        return results
+
+    def _insert(self, user : dict):
+        field = self.conflict(user["username"], user["email"])
+        if field is not None:
+            raise DuplicateUser(field)
+        self._users[user["username"]] = user
+        self._by_email[email_key(user["email"])] = user["username"]
@@ -0,0 +1,337 @@
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+
+DURABILITY_MODES = ("always", "batch", "interval")
+
+logger = logging.getLogger(__name__)
+
+
+class WALError(RuntimeError):
+    pass
+
+
+def encode_entry(entry : dict) -> bytes:
+    payload = json.dumps(entry, separators=(",", ":")).encode()
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+
+def read_entries(path : str, limit : int | None = None):
+    """
+    Yield (end_offset, entry) for every intact line of the log at `path`
+
+    Stops at the first line whose checksum or JSON does not verify, which
+    is what a write torn by a crash looks like.
+    """
+    try:
+        log_file = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with log_file:
+        offset = 0
+        for line in log_file:
+            if limit is not None and offset + len(line) > limit:
+                return
+            if not line.endswith(b"\n") or len(line) < 10:
+                return
+            checksum, payload = line[:8], line[9:-1]
+            try:
+                if int(checksum, 16) != zlib.crc32(payload):
+                    return
+                entry = json.loads(payload)
+            except ValueError:
+                return
+            offset += len(line)
+            yield offset, entry
+
+
+class WriteAheadLog:
+    """
+    Append-only log of item writes with group commit
+
+    Entries are JSON objects with an `op` ("put" / "delete") and an `id`;
+    each is written as one checksummed line. Entries without an `id` are
+    markers (like the item store's "init") that compaction keeps once. `durability` decides when an
+    `append` returns:
+
+        always   - after its own write and fsync
+        batch    - after an fsync that covers it; writers that arrive while
+                   an fsync is running are written and synced together by
+                   the next one (group commit), so they share its cost
+        interval - once the entry is in the OS page cache; a background
+                   thread fsyncs every `interval` seconds
+
+    Call `start()` to run the background thread, which also compacts the
+    log (keeping only the latest entry per id, see `compact`) once it has grown past
+    `compact_min_bytes` and to twice its size after the last compaction.
+    """
+
+    def __init__(self, path : str, durability : str = "batch", interval : float = 0.05,
+                 compact_min_bytes : int = 64 * 1024 * 1024, compact_check_every : float = 60.0):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"durability must be one of {DURABILITY_MODES}, not {durability!r}")
+        self.path = path
+        self.durability = durability
+        self.interval = interval
+        self.compact_min_bytes = compact_min_bytes
+        self.compact_check_every = compact_check_every
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "ab")
+        self._lock = threading.Lock()
+        self._maintenance = threading.Lock()  # one compaction or rotation at a time
+        self._flushed = threading.Condition(self._lock)
+        self._pending : list[bytes] = []
+        self._appended = 0
+        self._durable = 0
+        self._flushing = False
+        self._failure : BaseException | None = None
+        self._closed = False
+        self._compacted_size = 0
+        self._stop = threading.Event()
+        self._thread : threading.Thread | None = None
+
+    def replay(self, apply) -> int:
+        """
+        Call `apply(entry)` for every entry in the log and return how many there were
+
+        A log set aside by `rotate` whose checkpoint never finished is
+        replayed first. A torn tail left by a crash is cut off so new entries
+        follow the last intact one.
+        """
+        count = 0
+        for _, entry in read_entries(self.path + ".old"):
+            apply(entry)
+            count += 1
+
+        valid_size = 0
+        for valid_size, entry in read_entries(self.path):
+            apply(entry)
+            count += 1
+        with self._lock:
+            self._file.flush()
+            if os.path.getsize(self.path) != valid_size:
+                os.truncate(self.path, valid_size)
+            self._compacted_size = valid_size
+        return count
+
+    def append(self, entry : dict):
+        self.append_many([entry])
+
+    def append_many(self, entries : list[dict]):
+        """Append several entries that become durable together (one fsync at most)"""
+        lines = b"".join(encode_entry(entry) for entry in entries)
+        with self._lock:
+            if self._closed:
+                raise WALError("Write-ahead log is closed")
+            self._raise_failure()
+
+            if self.durability == "always":
+                self._file.write(lines)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                return
+
+            self._pending.append(lines)
+            self._appended += 1
+            if self.durability == "interval":
+                self._write_pending()
+                return
+
+            sequence = self._appended
+            while self._durable < sequence:
+                self._raise_failure()
+                if self._flushing:
+                    self._flushed.wait()
+                else:
+                    self._group_commit()
+
+    def sync(self):
+        """Write and fsync everything appended so far"""
+        with self._lock:
+            self._raise_failure()
+            self._wait_for_flush()
+            self._write_pending()
+            covered = self._appended
+            fileno = self._file.fileno()
+            self._flushing = True
+        try:
+            os.fsync(fileno)
+        finally:
+            with self._lock:
+                self._flushing = False
+                self._durable = max(self._durable, covered)
+                self._flushed.notify_all()
+
+    def size(self) -> int:
+        with self._lock:
+            self._file.flush()
+            return os.path.getsize(self.path)
+
+    def compact(self):
+        """
+        Rewrite the log keeping only the latest entry for every id
+
+        A delete stays in as a tombstone: the id may still be in the snapshot
+        the log is replayed on top of. Tombstones go away when a checkpoint
+        writes a new snapshot and rotates the log. The bulk of the work runs without blocking writers; they only wait
+        while entries appended during the rewrite are copied across and the
+        new file is renamed into place.
+        """
+        with self._maintenance:
+            with self._lock:
+                self._wait_for_flush()
+                self._write_pending()
+                self._file.flush()
+                cutoff = os.path.getsize(self.path)
+
+            markers = {}
+            latest = {}
+            for _, entry in read_entries(self.path, limit=cutoff):
+                if "id" not in entry:
+                    markers[entry["op"]] = entry
+                    continue
+                latest.pop(entry["id"], None)  # keep the order of last writes
+                latest[entry["id"]] = entry
+
+            tmp_path = self.path + ".compact"
+            with open(tmp_path, "wb") as tmp_file:
+                for entry in [*markers.values(), *latest.values()]:
+                    tmp_file.write(encode_entry(entry))
+
+                with self._lock:
+                    self._wait_for_flush()
+                    self._write_pending()
+                    self._file.flush()
+                    with open(self.path, "rb") as log_file:
+                        log_file.seek(cutoff)
+                        while chunk := log_file.read(1024 * 1024):
+                            tmp_file.write(chunk)
+                    tmp_file.flush()
+                    os.fsync(tmp_file.fileno())
+                    os.replace(tmp_path, self.path)
+                    self._fsync_directory()
+                    self._file.close()
+                    self._file = open(self.path, "ab")
+                    self._durable = self._appended
+                    self._compacted_size = os.path.getsize(self.path)
+                    self._flushed.notify_all()
+
+    def rotate(self):
+        """
+        Set the current log aside as `<path>.old` and continue in an empty one
+
+        Used by checkpoints: everything in `.old` is about to be captured by a
+        snapshot, after which `finish_rotation` deletes it. Until then both
+        files are replayed, so a checkpoint that dies halfway loses nothing.
+        """
+        with self._maintenance:
+            old_path = self.path + ".old"
+            with self._lock:
+                self._wait_for_flush()
+                self._write_pending()
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                if os.path.exists(old_path):
+                    # an earlier checkpoint did not finish; keep both sets of entries
+                    with open(old_path, "ab") as old_file, open(self.path, "rb") as log_file:
+                        while chunk := log_file.read(1024 * 1024):
+                            old_file.write(chunk)
+                        old_file.flush()
+                        os.fsync(old_file.fileno())
+                    os.unlink(self.path)
+                else:
+                    os.replace(self.path, old_path)
+                self._file = open(self.path, "ab")
+                self._fsync_directory()
+                self._durable = self._appended
+                self._compacted_size = 0
+                self._flushed.notify_all()
+
+    def finish_rotation(self):
+        try:
+            os.unlink(self.path + ".old")
+        except FileNotFoundError:
+            pass
+
+    def start(self):
+        """Start the background thread for interval fsyncs and compaction"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._background, name="item-wal", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            if self._closed:
+                return
+            self._wait_for_flush()
+            self._write_pending()
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._closed = True
+            self._flushed.notify_all()
+
+    def _group_commit(self):
+        # called with the lock held; the lock is released around the fsync so
+        # later writers can queue up for the next batch meanwhile
+        self._flushing = True
+        batch, self._pending = self._pending, []
+        covered = self._appended
+        self._lock.release()
+        try:
+            self._file.write(b"".join(batch))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except BaseException as e:
+            self._failure = e
+            raise
+        finally:
+            self._lock.acquire()
+            self._flushing = False
+            self._flushed.notify_all()
+        self._durable = covered
+
+    def _write_pending(self):
+        if self._pending:
+            self._file.write(b"".join(self._pending))
+            self._pending = []
+            self._file.flush()
+
+    def _wait_for_flush(self):
+        while self._flushing:
+            self._flushed.wait()
+
+    def _raise_failure(self):
+        if self._failure is not None:
+            raise WALError("Write-ahead log is unusable after a failed write") from self._failure
+
+    def _fsync_directory(self):
+        if hasattr(os, "O_DIRECTORY"):
+            fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _background(self):
+        next_compaction_check = time.monotonic() + self.compact_check_every
+        while not self._stop.wait(self.interval if self.durability == "interval" else 1.0):
+            try:
+                if self.durability == "interval":
+                    self.sync()
+                if time.monotonic() >= next_compaction_check:
+                    next_compaction_check = time.monotonic() + self.compact_check_every
+                    size = self.size()
+                    if size >= self.compact_min_bytes and size >= 2 * self._compacted_size:
+                        self.compact()
+            except Exception:
+                logger.exception("Background write-ahead log maintenance failed")
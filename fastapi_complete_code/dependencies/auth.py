@@ -1,13 +1,131 @@
-from typing import Annotated
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
 
-from fastapi import HTTPException, Header
+logger = logging.getLogger(__name__)
 
 
-def verify_token(x_token : Annotated[str, Header()]):
-    if x_token != "fake-super-secret-token":
-        raise HTTPException(status_code = 400, detail = "X-Token header invalid")
+class InvalidToken(ValueError):
+    pass
+
+
+def _b64encode(raw : bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _b64decode(text : str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class TokenVerifier:
+    """
+    HMAC-SHA256 signed tokens with expiry, a verified-token cache and revocation
+
+    A token is `<payload>.<signature>`, both base64url, where the payload is
+    JSON claims with at least `sub`, `exp` (unix time) and `jti` (unique id).
+
+    Checking a signature means decoding, hashing and parsing JSON, so the
+    claims of tokens that passed are kept in a bounded LRU cache keyed by a
+    short digest of the token (the tokens themselves are not kept). An
+    entry lives for at most `cache_ttl` seconds and never past the token's
+    own expiry. Revoked token ids are held in memory until the tokens
+    would have expired anyway and are checked on every call, cached or not.
+    """
+
+    def __init__(self, secret : bytes, cache_size : int = 10_000, cache_ttl : float = 60.0, leeway : float = 0.0):
+        self._secret = secret
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.leeway = leeway
+        self._cache : OrderedDict[bytes, tuple[float, dict]] = OrderedDict()  # digest -> (valid until, claims)
+        self._revoked : dict[str, float] = {}  # jti -> exp
+        self._lock = threading.Lock()
+
+    def issue(self, subject : str, ttl : float = 3600.0, **claims) -> str:
+        claims = {"sub": subject, "exp": int(time.time() + ttl), "jti": secrets.token_hex(8), **claims}
+        payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+        return f"{payload}.{self._sign(payload)}"
+
+    def verify(self, token : str) -> dict:
+        """Return the claims of a valid token or raise InvalidToken"""
+        now = time.time()
+        key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._cache.move_to_end(key)
+                    claims = entry[1]
+                else:
+                    del self._cache[key]
+                    entry = None
+        if entry is None:
+            claims, expires = self._check(token, now)
+            with self._lock:
+                self._cache[key] = (min(now + self.cache_ttl, expires + self.leeway), claims)
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        if claims["jti"] in self._revoked:
+            raise InvalidToken("revoked")
+        return claims
+
+    def revoke(self, token : str):
+        """Reject `token` from now on; it does not need to be valid, only well formed"""
+        try:
+            claims = json.loads(_b64decode(token.partition(".")[0]))
+            jti, exp = str(claims["jti"]), float(claims["exp"])
+        except (ValueError, KeyError, TypeError):
+            raise InvalidToken("malformed")
+        now = time.time()
+        with self._lock:
+            for expired in [revoked for revoked, until in self._revoked.items() if until + self.leeway < now]:
+                del self._revoked[expired]
+            self._revoked[jti] = exp
+
+    def _sign(self, payload : str) -> str:
+        return _b64encode(hmac.digest(self._secret, payload.encode(), "sha256"))
+
+    def _check(self, token : str, now : float) -> tuple[dict, float]:
+        payload, _, signature = token.partition(".")
+        if not signature or not hmac.compare_digest(signature.encode(), self._sign(payload).encode()):
+            raise InvalidToken("bad signature")
+        try:
+            claims = json.loads(_b64decode(payload))
+            expires = float(claims["exp"])
+            claims["jti"] = str(claims["jti"])
+        except (ValueError, KeyError, TypeError):
+            raise InvalidToken("malformed")
+        if expires + self.leeway <= now:
+            raise InvalidToken("expired")
+        return claims, expires
+
+
+# when true, main.py puts AuthMiddleware in front of every route
+AUTH_ENABLED = os.environ.get("AUTH_ENABLED", "").lower() in ("1", "true", "yes")
+
+
+def _load_secret() -> bytes:
+    secret = os.environ.get("AUTH_SECRET")
+    if secret:
+        return secret.encode()
+    if AUTH_ENABLED:
+        logger.warning("AUTH_SECRET is not set; tokens are signed with a random key and die with the process")
+    return secrets.token_bytes(32)
+
+
+token_verifier = TokenVerifier(
+    _load_secret(),
+    cache_size=int(os.environ.get("AUTH_CACHE_SIZE", "10000")),
+    cache_ttl=float(os.environ.get("AUTH_CACHE_TTL", "60")),
+)
+
+API_KEYS = [key.encode() for key in os.environ.get("AUTH_API_KEYS", "fake-super-secret-key").split(",") if key]
 
-def verify_key(x_key : Annotated[str, Header()]):
-    if x_key != "fake-super-secret-key":
-        raise HTTPException(status_code = 400, detail = "X-Key header invalid")
-    return x_key
\ No newline at end of file
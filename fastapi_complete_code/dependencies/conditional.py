@@ -0,0 +1,30 @@
+from typing import Annotated
+
+from fastapi import Header, Response
+
+IfNoneMatch = Annotated[str | None, Header()]
+
+
+def version_etag(epoch : str, version : int, representation : str) -> str:
+    """Strong ETag for one version of a stored record in one representation (e.g. a codec name)"""
+    return f'"{epoch}-{version}-{representation}"'
+
+
+def etag_matches(if_none_match : str | None, etag : str) -> bool:
+    """
+    Whether an If-None-Match header covers `etag`
+
+    If-None-Match uses the weak comparison, so a `W/` prefix is ignored;
+    `*` matches any current representation.
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def not_modified(etag : str) -> Response:
+    return Response(status_code = 304, headers = {"ETag": etag, "Vary": "Accept"})
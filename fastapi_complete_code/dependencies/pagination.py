@@ -0,0 +1,22 @@
+import base64
+import json
+
+from fastapi import HTTPException
+
+
+def encode_cursor(order_by : str, key : tuple[float, str]) -> str:
+    """Pack the last key of a page into an opaque, URL-safe cursor"""
+    raw = json.dumps([order_by, key[0], key[1]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor : str, order_by : str) -> tuple[float, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_order, timestamp, item_id = json.loads(base64.urlsafe_b64decode(padded))
+        key = (float(timestamp), str(item_id))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code = 400, detail = "Invalid cursor")
+    if cursor_order != order_by:
+        raise HTTPException(status_code = 400, detail = "Cursor was issued for a different order_by")
+    return key
@@ -0,0 +1,145 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+
+
+class PasswordQueueFull(RuntimeError):
+    pass
+
+
+def _b64(raw : bytes) -> str:
+    return base64.b64encode(raw).decode()
+
+
+def hash_password(password : str, n : int, r : int, p : int) -> str:
+    """scrypt `password` with a fresh salt; returns `scrypt$n$r$p$salt$hash`"""
+    salt = secrets.token_bytes(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=_maxmem(n, r, p))
+    return f"scrypt${n}${r}${p}${_b64(salt)}${_b64(digest)}"
+
+
+def hash_passwords(passwords : list[str], n : int, r : int, p : int) -> list[str]:
+    return [hash_password(password, n, r, p) for password in passwords]
+
+
+def check_password(password : str, hashed : str) -> bool:
+    try:
+        scheme, n, r, p, salt, digest = hashed.split("$")
+        n, r, p = int(n), int(r), int(p)
+        salt, digest = base64.b64decode(salt), base64.b64decode(digest)
+    except ValueError:
+        return False
+    if scheme != "scrypt":
+        return False
+    candidate = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=_maxmem(n, r, p), dklen=len(digest))
+    return hmac.compare_digest(candidate, digest)
+
+
+def _maxmem(n : int, r : int, p : int) -> int:
+    # scrypt needs about 128 * n * r * p bytes; OpenSSL's default cap is 32 MiB
+    return 128 * n * r * p + 1024 * 1024
+
+
+class PasswordHasher:
+    """
+    scrypt password hashing in a pool of worker processes
+
+    A hash is CPU-bound on purpose (n, r, p set the cost), and in a thread
+    it would hold up the threadpool that serves sync endpoints. The work
+    runs in `max_workers` processes instead, and `hash` / `verify` are
+    awaitable. At most `max_queue` calls may be queued or running at once;
+    beyond that `PasswordQueueFull` is raised right away, so a burst of
+    signups is shed instead of piling up behind the pool. The processes are
+    started on first use.
+
+    Batches from `hash_many` take at most `max_workers` of those slots,
+    across all batches, so a signup never waits behind more than one small
+    batch chunk per worker.
+    """
+
+    def __init__(self, max_workers : int, max_queue : int, n : int = 2 ** 14, r : int = 8, p : int = 1):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.n, self.r, self.p = n, r, p
+        self._executor = None  # ProcessPoolExecutor
+        self._pending = 0
+        self._bulk = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def hash(self, password : str) -> str:
+        return await self._run(hash_password, password, self.n, self.r, self.p)
+
+    async def verify(self, password : str, hashed : str) -> bool:
+        return await self._run(check_password, password, hashed)
+
+    async def hash_many(self, passwords : list[str], chunk_size : int = 4, retry_after : float = 0.05) -> list[str]:
+        """
+        Hash a batch of passwords spread over all workers
+
+        The batch goes out in chunks of `chunk_size` passwords, one task per
+        chunk, with no more than `max_workers` batch tasks in flight. Small
+        chunks keep the pool's queue short: an interactive `hash` submitted
+        meanwhile runs after the chunks already started, not after the whole
+        batch. When there is no room this waits instead of failing, which
+        suits imports that would rather be slow than rejected.
+        """
+        chunks = [passwords[start:start + chunk_size] for start in range(0, len(passwords), chunk_size)]
+        results = [None] * len(chunks)
+        queued = iter(range(len(chunks)))
+
+        async def worker():
+            for number in queued:
+                while True:
+                    try:
+                        results[number] = await self._run(hash_passwords, chunks[number], self.n, self.r, self.p, bulk = True)
+                        break
+                    except PasswordQueueFull:
+                        await asyncio.sleep(retry_after)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.max_workers, len(chunks)))))
+        return [hashed for chunk in results for hashed in chunk]
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    async def _run(self, fn, *args, bulk : bool = False):
+        with self._lock:
+            if self._pending >= self.max_queue:
+                raise PasswordQueueFull(f"{self._pending} password hashes already queued")
+            if bulk and self._bulk >= self.max_workers:
+                raise PasswordQueueFull(f"{self._bulk} batch chunks already running")
+            self._pending += 1
+            self._bulk += bulk
+            if self._executor is None:
+                # imported here: multiprocessing alone adds tens of ms to worker startup
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                # spawn: forking a process that already runs threads can copy held locks
+                self._executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            executor = self._executor
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._bulk -= bulk
+
+
+password_hasher = PasswordHasher(
+    max_workers=int(os.environ.get("PASSWORD_WORKERS", str(os.cpu_count() or 1))),
+    max_queue=int(os.environ.get("PASSWORD_MAX_QUEUE", "256")),
+    n=int(os.environ.get("PASSWORD_SCRYPT_N", str(2 ** 14))),
+    r=int(os.environ.get("PASSWORD_SCRYPT_R", "8")),
+    p=int(os.environ.get("PASSWORD_SCRYPT_P", "1")),
+)
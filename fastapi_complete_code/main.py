@@ -1,25 +1,85 @@
-from fastapi import FastAPI, Depends
-from router import files, items, users, filters, product
+import importlib
+import os
+import sys
+from contextlib import asynccontextmanager
 
+from fastapi import FastAPI
+from middleware.auth import AuthMiddleware
+from middleware.lazy_routers import LAZY_ROUTERS, LazyRouters
+from middleware.metrics import METRICS_ENABLED, MetricsMiddleware, metrics_registry
+from middleware.profiling import PROFILE_SAMPLE_RATE, PROFILE_TOKEN, PROFILING_ENABLED, ProfilingMiddleware, profile_store
+from serialization.negotiation import NegotiatedResponse
 
-from dependencies.auth import verify_key, verify_token
+
+from dependencies.auth import API_KEYS, AUTH_ENABLED, token_verifier
+
+@asynccontextmanager
+async def lifespan(app : FastAPI):
+    yield
+    # the store and the password workers are only there if a router imported them (see LAZY_ROUTERS)
+    if "databases.fake_db" in sys.modules:
+        # snapshot the items and close the write-ahead log, if they are configured
+        sys.modules["databases.fake_db"].close_item_store()
+    if "dependencies.passwords" in sys.modules:
+        sys.modules["dependencies.passwords"].password_hasher.shutdown()
 
 app = FastAPI(
+    lifespan=lifespan,
+    # JSON by default, MessagePack for clients that send Accept: application/msgpack
+    default_response_class=NegotiatedResponse,
     title="FastAPI CODE IMPLEMENTATION",
     description="This is the complete code implementation of FastAPI fundamentals",
-    # dependencies=[Depends(verify_key), Depends(verify_token)]
 )
 
 @app.get("/")
 def read_root():
     return {"Hello": "World"}
 
-app.include_router(items.router)
-app.include_router(users.router)
-app.include_router(files.router)
-app.include_router(filters.router)
+# path prefix -> module whose `router` serves it; the prefixes repeat the routers' own
+ROUTERS = {
+    "/items": "router.items",
+    "/users": "router.users",
+    "/files": "router.files",
+    "/filters": "router.filters",
+    "/product": "router.product",
+}
+
+if METRICS_ENABLED:
+    ROUTERS["/metrics"] = "router.metrics"
+
+# stored profiles are listed and served under /admin/profiles to holders of
+# PROFILE_TOKEN; with only a sample rate they are just written to PROFILE_DIR
+if PROFILING_ENABLED and PROFILE_TOKEN is not None:
+    ROUTERS["/admin"] = "router.admin"
+
+# LAZY_ROUTERS=1 imports each router on the first request to its prefix, for faster worker startup
+if LAZY_ROUTERS:
+    app.add_middleware(LazyRouters, target=app, routers=ROUTERS)
+else:
+    for module in ROUTERS.values():
+        app.include_router(importlib.import_module(module).router)
+
+# AUTH_ENABLED=1 requires a valid X-Key and signed X-Token on every route but the docs
+if AUTH_ENABLED:
+    app.add_middleware(
+        AuthMiddleware,
+        verifier=token_verifier,
+        api_keys=API_KEYS,
+        public={app.openapi_url, app.docs_url, app.swagger_ui_oauth2_redirect_url, app.redoc_url},
+    )
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, registry=metrics_registry)
 
-app.include_router(product.router)
+# PROFILE_TOKEN (X-Profile header) and/or PROFILE_SAMPLE_RATE turn on request profiling
+if PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        token=PROFILE_TOKEN,
+        sample_rate=PROFILE_SAMPLE_RATE,
+        interval=float(os.environ.get("PROFILE_INTERVAL", "0.001")),
+    )
 
 
 
@@ -0,0 +1,53 @@
+import importlib
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LazyRouters:
+    """
+    Include routers in a FastAPI app on the first request under their prefix
+
+    `routers` maps a path prefix to the module whose `router` serves it.
+    The module is imported, and its routes compiled, when a request path
+    first falls under the prefix, which moves that cost from worker startup
+    to the first request of each prefix. A request for the OpenAPI schema
+    loads every router so the schema is complete. Loading runs on the event
+    loop: imports hold the interpreter's import lock either way, and with
+    no await between the check and the include, a prefix is loaded once.
+    """
+
+    def __init__(self, app, target, routers : dict[str, str]):
+        self.app = app
+        self.target = target
+        self.pending = dict(routers)
+
+    def load(self, prefix : str):
+        started = time.perf_counter()
+        module = importlib.import_module(self.pending[prefix])
+        self.target.include_router(module.router)
+        # a schema generated before this router was included would miss its routes
+        self.target.openapi_schema = None
+        del self.pending[prefix]
+        logger.info("loaded %s for %s in %.1f ms", module.__name__, prefix, (time.perf_counter() - started) * 1000)
+
+    def load_all(self):
+        for prefix in list(self.pending):
+            self.load(prefix)
+
+    async def __call__(self, scope, receive, send):
+        if self.pending and scope["type"] == "http":
+            path = scope["path"]
+            if path == self.target.openapi_url:
+                self.load_all()
+            else:
+                for prefix in list(self.pending):
+                    if path == prefix or path.startswith(prefix + "/"):
+                        self.load(prefix)
+        await self.app(scope, receive, send)
+
+
+# when true, main.py mounts its routers through LazyRouters instead of importing them at startup
+LAZY_ROUTERS = os.environ.get("LAZY_ROUTERS", "").lower() in ("1", "true", "yes")
@@ -0,0 +1,170 @@
+import os
+import time
+from bisect import bisect_left
+
+from fastapi.routing import APIRoute
+
+# upper bounds in seconds: 100 us doubling up to ~13 s, then +Inf
+LATENCY_BUCKETS = tuple(0.0001 * 2 ** exponent for exponent in range(18))
+
+
+def _label(value : str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RouteStats:
+    """
+    Counters of one (route, method, status) combination
+
+    The latency histogram has log-spaced buckets, so recording a request is
+    one bisect over LATENCY_BUCKETS and a list increment.
+    """
+
+    __slots__ = ("buckets", "count", "seconds", "request_bytes", "response_bytes")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+
+class MetricsRegistry:
+    """
+    Per-route request metrics, rendered in the Prometheus text format
+
+    Requests are recorded by `MetricsMiddleware` and counted in flight by
+    `MeteredRoute`, both on the event loop thread, which is the only
+    writer, so recording takes no lock; `/metrics` reads the counters on
+    that same thread. Each worker process keeps its own registry.
+    """
+
+    def __init__(self):
+        self._stats : dict[tuple[str, str, str], RouteStats] = {}
+        self._in_flight : dict[tuple[str, str], int] = {}
+
+    def enter(self, route : str, method : str):
+        key = (route, method)
+        self._in_flight[key] = self._in_flight.get(key, 0) + 1
+
+    def leave(self, route : str, method : str):
+        self._in_flight[(route, method)] -= 1
+
+    def observe(self, route : str, method : str, status : int, seconds : float, request_bytes : int, response_bytes : int):
+        key = (route, method, str(status))
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = RouteStats()
+        stats.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        stats.count += 1
+        stats.seconds += seconds
+        stats.request_bytes += request_bytes
+        stats.response_bytes += response_bytes
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_request_duration_seconds Time from receiving a request to sending the last byte of its response",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        bytes_lines = {"request": [], "response": []}
+        for (route, method, status), stats in sorted(self._stats.items()):
+            labels = f'route="{_label(route)}",method="{method}",status="{status}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {stats.seconds:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {stats.count}")
+            bytes_lines["request"].append(f"http_request_bytes_total{{{labels}}} {stats.request_bytes}")
+            bytes_lines["response"].append(f"http_response_bytes_total{{{labels}}} {stats.response_bytes}")
+
+        for kind in ("request", "response"):
+            lines.append(f"# HELP http_{kind}_bytes_total Bytes of {kind} bodies")
+            lines.append(f"# TYPE http_{kind}_bytes_total counter")
+            lines.extend(bytes_lines[kind])
+        lines.append("# HELP http_requests_in_flight Requests being handled right now")
+        lines.append("# TYPE http_requests_in_flight gauge")
+        for (route, method), count in sorted(self._in_flight.items()):
+            lines.append(f'http_requests_in_flight{{route="{_label(route)}",method="{method}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that records every HTTP request in a MetricsRegistry
+
+    Requests are labelled with the path template of the route that handled
+    them (`/items/{item_id}`, not the concrete path) so the number of
+    series stays bounded; requests that match no route share one label.
+    """
+
+    def __init__(self, app, registry : "MetricsRegistry"):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registry = self.registry
+        status = 500
+        request_bytes = 0
+        response_bytes = 0
+
+        async def counting_receive():
+            nonlocal request_bytes
+            message = await receive()
+            request_bytes += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            route = scope.get("route")
+            registry.observe(
+                getattr(route, "path", "<unmatched>"),
+                scope["method"],
+                status,
+                time.perf_counter() - started,
+                request_bytes,
+                response_bytes,
+            )
+
+
+class MeteredRoute(APIRoute):
+    """
+    Route that counts its requests in flight in `metrics_registry`
+
+    The middleware only learns the route of a request after the app has
+    answered it, so the gauge is kept here, around the route's handling,
+    which lasts until the last byte of a streamed response is sent.
+    Requests that match none of these routes are not in the gauge.
+    """
+
+    async def handle(self, scope, receive, send):
+        if not METRICS_ENABLED:
+            await super().handle(scope, receive, send)
+            return
+        method = scope["method"]
+        metrics_registry.enter(self.path, method)
+        try:
+            await super().handle(scope, receive, send)
+        finally:
+            metrics_registry.leave(self.path, method)
+
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+
+metrics_registry = MetricsRegistry()
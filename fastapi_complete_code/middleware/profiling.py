@@ -0,0 +1,232 @@
+import functools
+import hmac
+import inspect
+import logging
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SUFFIX = ".collapsed"
+PROFILE_NAME = re.compile(r"^[0-9]+-[A-Z]+-[A-Za-z0-9_.-]*\.collapsed$")
+
+# (file name, function) of leaf frames that mean a thread is parked, not working
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+# threadpool threads currently running a sync endpoint for the profiled request
+_profiled_threads : ContextVar[set[int] | None] = ContextVar("profiled_threads", default=None)
+
+
+class StackSampler:
+    """
+    Sample the Python stacks of one request's threads at a fixed interval
+
+    Other requests run on the same threads concurrently, so only stacks
+    that belong to this request are counted: the event loop thread while
+    `anchor` (the frame the request was entered through) is on its stack,
+    and the threadpool workers in `threads` while they run its sync
+    endpoint. Work the request hands to other tasks, streamed response
+    bodies and sync dependencies are not attributed. Stacks are counted in
+    the collapsed format flame graph tools read: `outer;...;inner count`,
+    one line per distinct stack.
+    """
+
+    def __init__(self, interval : float, threads : set[int], loop_thread : int, anchor):
+        self.interval = interval
+        self.threads = threads
+        self.loop_thread = loop_thread
+        self.anchor = anchor
+        self.samples : Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in (self.loop_thread, *self.threads):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                ours = thread_id != self.loop_thread
+                while frame is not None:
+                    ours = ours or frame is self.anchor
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if ours:
+                    self.samples[";".join(reversed(stack))] += 1
+
+
+def _tracked(endpoint):
+    """Wrap a sync endpoint so the profiled request knows which worker thread runs it"""
+
+    @functools.wraps(endpoint)
+    def tracked_endpoint(*args, **kwargs):
+        threads = _profiled_threads.get()
+        if threads is None:
+            return endpoint(*args, **kwargs)
+        thread_id = threading.get_ident()
+        threads.add(thread_id)
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            threads.discard(thread_id)
+
+    return tracked_endpoint
+
+
+class ProfiledRoute(APIRoute):
+    """
+    Route whose sync endpoint reports its worker thread to the profiler
+
+    FastAPI runs sync endpoints in the threadpool with a copy of the
+    request's context, where the wrapper finds the set of threads the
+    profiled request is sampling. Without profiling the endpoint is left
+    as it is.
+    """
+
+    def __init__(self, path : str, endpoint, **kwargs):
+        if PROFILING_ENABLED and inspect.isfunction(endpoint) and not (
+            inspect.iscoroutinefunction(endpoint) or inspect.isgeneratorfunction(endpoint) or inspect.isasyncgenfunction(endpoint)
+        ):
+            endpoint = _tracked(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+class ProfileStore:
+    """
+    Directory of collapsed-stack profiles, keeping only the newest `max_files`
+
+    File names are `<unix ms>-<method>-<path>-<random>.collapsed`, which is
+    also how they are listed and fetched through the admin endpoints; the
+    random part keeps requests to one path in the same millisecond apart.
+    """
+
+    def __init__(self, root : str, max_files : int = 100):
+        self.root = root
+        self.max_files = max_files
+
+    def new_name(self, method : str, path : str) -> str:
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", path.strip("/"))[:80]
+        return f"{time.time_ns() // 1_000_000}-{method}-{slug}-{secrets.token_hex(3)}{PROFILE_SUFFIX}"
+
+    def save(self, name : str, samples : Counter):
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, name), "w") as profile_file:
+            for stack, count in samples.most_common():
+                profile_file.write(f"{stack} {count}\n")
+        for stale in self.list()[self.max_files:]:
+            os.unlink(os.path.join(self.root, stale["name"]))
+
+    def list(self) -> list[dict]:
+        """Stored profiles, newest first"""
+        try:
+            names = [name for name in os.listdir(self.root) if PROFILE_NAME.match(name)]
+        except FileNotFoundError:
+            return []
+        profiles = []
+        for name in sorted(names, key=lambda name: int(name.split("-", 1)[0]), reverse=True):
+            try:
+                size = os.path.getsize(os.path.join(self.root, name))
+            except FileNotFoundError:
+                continue
+            profiles.append({"name": name, "size": size})
+        return profiles
+
+    def path_for(self, name : str) -> str | None:
+        """Path of a stored profile, or None; names that are not profile names are refused"""
+        if not PROFILE_NAME.match(name):
+            return None
+        path = os.path.join(self.root, name)
+        return path if os.path.isfile(path) else None
+
+
+class ProfilingMiddleware:
+    """
+    Profile selected HTTP requests with a StackSampler
+
+    A request is profiled when it carries `X-Profile: <PROFILE_TOKEN>`, or
+    at random with probability `sample_rate`. The profile's file name is
+    returned in the `X-Profile-Id` response header and the file is written
+    once the response is complete. Requests that are not selected only pay
+    for the header lookup and one random number; when profiling is off the
+    middleware is not installed at all.
+    """
+
+    def __init__(self, app, store : ProfileStore, token : str | None, sample_rate : float, interval : float):
+        self.app = app
+        self.store = store
+        self.token = token.encode() if token else None
+        self.sample_rate = sample_rate
+        self.interval = interval
+
+    def selected(self, scope) -> bool:
+        if self.token is not None:
+            for key, value in scope["headers"]:
+                if key == b"x-profile":
+                    return hmac.compare_digest(value, self.token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.selected(scope):
+            await self.app(scope, receive, send)
+            return
+
+        name = self.store.new_name(scope["method"], scope["path"])
+
+        async def tagging_send(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", name.encode())]
+            await send(message)
+
+        threads : set[int] = set()
+        sampler = StackSampler(self.interval, threads, threading.get_ident(), sys._getframe())
+        token = _profiled_threads.set(threads)
+        sampler.start()
+        try:
+            await self.app(scope, receive, tagging_send)
+        finally:
+            _profiled_threads.reset(token)
+            samples = await run_in_threadpool(sampler.stop)
+            await run_in_threadpool(self.store.save, name, samples)
+
+
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN") or None
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILING_ENABLED = PROFILE_TOKEN is not None or PROFILE_SAMPLE_RATE > 0
+
+# the admin endpoints that list and serve profiles are guarded by the token, so without one they are not mounted
+if PROFILE_TOKEN is None and PROFILE_SAMPLE_RATE > 0:
+    logger.warning("PROFILE_SAMPLE_RATE is set without PROFILE_TOKEN; profiles are only written to PROFILE_DIR, /admin/profiles is off")
+
+profile_store = ProfileStore(
+    os.environ.get("PROFILE_DIR", "profiles"),
+    max_files=int(os.environ.get("PROFILE_MAX_FILES", "100")),
+)
@@ -0,0 +1,30 @@
+import hmac
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse
+
+from middleware.profiling import PROFILE_TOKEN, profile_store
+
+
+def verify_profile_token(x_profile_token : Annotated[str, Header()]):
+    if PROFILE_TOKEN is None or not hmac.compare_digest(x_profile_token.encode(), PROFILE_TOKEN.encode()):
+        raise HTTPException(status_code = 403, detail = "X-Profile-Token header invalid")
+
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(verify_profile_token)],
+)
+
+@router.get("/profiles")
+def list_profiles():
+    return {"profiles": profile_store.list()}
+
+@router.get("/profiles/{name}")
+def download_profile(name : str):
+    path = profile_store.path_for(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=name)
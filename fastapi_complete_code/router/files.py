@@ -1,57 +1,206 @@
-from http.client import HTTPException
+from typing import Annotated
+
+from fastapi import APIRouter, Header, HTTPException, Request, Response
+from starlette.concurrency import run_in_threadpool
+
 from schemas.files import *
-from fastapi import APIRouter, File, UploadFile
+from storage.blob_store import blob_store
+from storage.file_pool import file_pool
+from storage.ingest import IngestError, ingest_multipart
+from storage.sniff import sniff_content_type
+from storage.uploads import ChecksumMismatch, UploadConflict, UploadNotFound, parse_checksum, upload_sessions
+from router.routes import AppRoute
 
 router = APIRouter(
     prefix="/files",
-    tags=["files"]
+    tags=["files"],
+    route_class=AppRoute,
 
 )
 
-@router.post("/upload", response_model= FileResponse)
-def upload_file(file : UploadFile = File(...) ):
-
-    try:
-        content = file.file.read()
 
-        file_size = len(content)
+def multipart_body(field : str, multiple : bool = False) -> dict:
+    """
+    OpenAPI request body for the streaming endpoints
+
+    They read the raw request stream instead of declaring `UploadFile`
+    parameters, so the form is described here to keep /docs usable.
+    """
+    file_schema = {"type": "string", "format": "binary"}
+    if multiple:
+        file_schema = {"type": "array", "items": file_schema}
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {field: file_schema},
+                        "required": [field],
+                    }
+                }
+            },
+        }
+    }
 
-        # Reset file position after reading
-        file.file.seek(0)
 
-        return {
-            "filename": file.filename,
-            "file_size": file_size,
-            "content_type": file.content_type
+async def receive_files(request : Request, field : str, multiple : bool = False):
+    """
+    Stream the upload and hand every finished file to the file worker pool
 
-        }
-    except Exception as e:
-        raise HTTPException(status_code=405, detail=f"Error processing file {str(e)}")
-    finally:
-        file.close()
+    Returns (upload, result) pairs in the order the files were sent, where
+    result is the `process` output or the exception it raised.
+    """
+    writers = []
+    uploads = []
+    futures = []
 
-@router.post("/upload/multiple", response_model=MultipleFileResponse)
-def upload_multiple_files(files: list[UploadFile] = File(...)):
-    try:
-        list_of_files = []
+    def open_writer(filename, content_type):
+        writer = blob_store.open_writer()
+        writers.append(writer)
+        return writer
 
-        for file in files:
-            content = file.file.read()
-            file_size = len(content)
+    def on_file(upload):
+        if upload.field_name != field or (uploads and not multiple):
+            upload.sink.discard()
+            return
+        uploads.append(upload)
+        futures.append(file_pool.submit(process, upload))
 
-            # Reset file position after reading
-            file.file.seek(0)
+    try:
+        await ingest_multipart(request, sink_factory=open_writer, on_file=on_file)
+    except BaseException as e:
+        await file_pool.gather(futures)
+        await run_in_threadpool(discard, writers)
+        if isinstance(e, IngestError):
+            raise HTTPException(status_code=400, detail=f"Error processing upload {str(e)}")
+        raise
 
-            list_of_files.append({
-                "filename": file.filename,
-                "file_size": file_size,
-                "content_type": file.content_type,  # Changed from "content-type" to "content_type"
-            })
+    if not uploads:
+        raise HTTPException(status_code=400, detail=f"No file sent in form field '{field}'")
+    return list(zip(uploads, await file_pool.gather(futures)))
 
-        return {"files": list_of_files}
-    except Exception as e:
-        raise HTTPException(status_code=408, detail=f"Error processing files {str(e)}")
 
+def discard(writers):
+    for writer in writers:
+        writer.discard()
 
 
+def process(upload) -> dict:
+    """Sniff one received upload and commit it to the blob store (runs on the file worker pool)"""
+    try:
+        detected_content_type = sniff_content_type(upload.head)
+        deduplicated = blob_store.commit(upload.sink, upload.sha256)
+    except BaseException:
+        upload.sink.discard()
+        raise
+    return {
+        "filename": upload.filename,
+        "file_size": upload.file_size,
+        "content_type": upload.content_type,
+        "sha256": upload.sha256,
+        "deduplicated": deduplicated,
+        "detected_content_type": detected_content_type,
+    }
+
+
+@router.post("/upload", response_model= FileResponse, openapi_extra=multipart_body("file"))
+async def upload_file(request : Request):
+    [(upload, result)] = await receive_files(request, "file")
+    if isinstance(result, BaseException):
+        raise HTTPException(status_code=500, detail=f"Error processing file {str(result)}")
+    return result
+
+@router.post("/upload/multiple", response_model=MultipleFileResponse, openapi_extra=multipart_body("files", multiple=True))
+async def upload_multiple_files(request : Request):
+    list_of_files = []
+    errors = []
+
+    for index, (upload, result) in enumerate(await receive_files(request, "files", multiple=True)):
+        if isinstance(result, BaseException):
+            errors.append({"index": index, "filename": upload.filename, "detail": str(result)})
+        else:
+            list_of_files.append(result)
+
+    return {"files": list_of_files, "errors": errors}
+
+
+"""
+Resumable uploads: create a session, PATCH chunks at the current offset
+(retrying from GET's offset after a dropped connection), then complete it
+"""
+
+def get_session(upload_id : str) -> dict:
+    try:
+        return upload_sessions.get(upload_id)
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+@router.post("/uploads", response_model=UploadSessionStatus, status_code=201)
+async def create_upload(upload : UploadSessionCreate, response : Response):
+    # abandoned sessions hold preallocated space; new ones are a good time to reclaim it
+    await upload_sessions.expire_stale()
+    session = await run_in_threadpool(upload_sessions.create, upload.filename, upload.content_type, upload.length, upload.sha256)
+    response.headers["Location"] = f"{router.prefix}/uploads/{session['upload_id']}"
+    response.headers["Upload-Offset"] = "0"
+    return session
+
+@router.get("/uploads/{upload_id}", response_model=UploadSessionStatus)
+def read_upload(upload_id : str, response : Response):
+    session = get_session(upload_id)
+    response.headers["Upload-Offset"] = str(session["offset"])
+    return session
+
+@router.patch("/uploads/{upload_id}", response_model=UploadSessionStatus, openapi_extra={
+    "requestBody": {"required": True, "content": {"application/offset+octet-stream": {"schema": {"type": "string", "format": "binary"}}}}
+})
+async def write_upload_chunk(
+    upload_id : str,
+    request : Request,
+    response : Response,
+    upload_offset : Annotated[int, Header(ge=0)],
+    upload_checksum : Annotated[str | None, Header()] = None,
+):
+    try:
+        checksum = parse_checksum(upload_checksum) if upload_checksum else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+    try:
+        session = await upload_sessions.write_chunk(upload_id, upload_offset, request.stream(), checksum)
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except UploadConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ChecksumMismatch as e:
+        raise HTTPException(status_code=460, detail=str(e))
+
+    response.headers["Upload-Offset"] = str(session["offset"])
+    return session
+
+@router.post("/uploads/{upload_id}/complete", response_model=FileResponse)
+async def complete_upload(upload_id : str):
+    try:
+        session, deduplicated = await upload_sessions.complete(upload_id)
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except UploadConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ChecksumMismatch as e:
+        raise HTTPException(status_code=460, detail=str(e))
+
+    return {
+        "filename": session["filename"],
+        "file_size": session["length"],
+        "content_type": session["content_type"],
+        "sha256": session["sha256"],
+        "deduplicated": deduplicated,
+    }
+
+@router.delete("/uploads/{upload_id}", status_code=204)
+async def delete_upload(upload_id : str):
+    try:
+        await upload_sessions.delete(upload_id)
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
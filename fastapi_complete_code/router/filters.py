@@ -2,10 +2,12 @@ from typing import Annotated
 
 from fastapi import APIRouter, Query
 from schemas.filter import *
+from router.routes import AppRoute
 
 router = APIRouter(
     prefix="/filters",
     tags=["filters"],
+    route_class=AppRoute,
 
 )
 
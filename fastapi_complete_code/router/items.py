@@ -1,35 +1,216 @@
-from http.client import HTTPException
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Body, Header, HTTPException, Query, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+
 from databases.fake_db import *
+from dependencies.conditional import IfNoneMatch, etag_matches, not_modified, version_etag
+from dependencies.pagination import decode_cursor, encode_cursor
+from schemas.filter import ExportParams, FilterParams
 from schemas.items import *
-from fastapi import APIRouter
+from schemas.patch import MERGE_PATCH_MEDIA_TYPE, ModelPatcher
+from serialization.csv_export import ItemCsvWriter
+from serialization.ndjson import MAX_LINE_BYTES, NDJSON_MEDIA_TYPE, DuplexStreamingResponse, NDJSONValidator, encode_ndjson, iter_ndjson_lines
+from serialization.negotiation import current_codec
+from serialization.response_cache import response_cache
+from router.routes import AppRoute
+
+BULK_BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 1000
+
+bulk_validator = NDJSONValidator(BulkOperation)
+item_patcher = ModelPatcher(ItemBase)
 
 router = APIRouter(
     prefix="/items",
     tags=["items"],
     responses={404: {"description": "Not found"}},
+    route_class=AppRoute,
 )
 
+@router.get("/", response_model=ItemPage)
+def list_items(filters : Annotated[FilterParams, Query()]):
+    after = decode_cursor(filters.cursor, filters.order_by) if filters.cursor else None
+    entries, last_key = item_store.page(
+        order_by=filters.order_by,
+        limit=filters.limit,
+        after=after,
+        offset=filters.offset,
+        **filters.store_filters(),
+    )
+    return {
+        "items": [{"item_id": item_id, "item": item} for item_id, item in entries],
+        "next_cursor": encode_cursor(filters.order_by, last_key) if last_key else None,
+    }
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}, "text/csv": {}}}},
+)
+def export_items(params : Annotated[ExportParams, Query()]):
+    """
+    Stream every matching item as NDJSON or CSV
+
+    Items are read from the store and encoded EXPORT_CHUNK_SIZE at a time
+    while the response is being sent, so memory use does not depend on the
+    size of the catalog and the first bytes go out right away.
+    """
+    media_type = "text/csv" if params.format == "csv" else NDJSON_MEDIA_TYPE
+    return StreamingResponse(
+        export_chunks(params),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="items.{params.format}"'},
+    )
+
+
+def export_chunks(params : ExportParams):
+    chunks = item_store.scan(EXPORT_CHUNK_SIZE, **params.store_filters())
+    if params.format == "csv":
+        writer = ItemCsvWriter()
+        yield writer.encode(())  # header row
+        for entries in chunks:
+            yield writer.encode(entries)
+    else:
+        for entries in chunks:
+            yield encode_ndjson({"item_id": item_id, "item": item} for item_id, item in entries)
+
+
+@router.post(
+    "/bulk",
+    response_class=DuplexStreamingResponse,
+    responses={200: {"description": "One BulkResult per line", "content": {NDJSON_MEDIA_TYPE: {}}}},
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {NDJSON_MEDIA_TYPE: {"schema": {"type": "string", "description": "One BulkUpsert or BulkPatch object per line"}}},
+        }
+    },
+)
+async def bulk_write_items(request : Request):
+    """
+    Apply a stream of upsert/patch operations, one JSON object per line
+
+    The body is read as it arrives and handled in batches of
+    BULK_BATCH_SIZE lines: each batch is validated line by line, written
+    with a single store call and answered with one result line per operation
+    before the next batch is read, so memory stays flat however large the
+    body is.
+    """
+    async def results():
+        batch = []
+        async for line in iter_ndjson_lines(request.stream()):
+            batch.append(line)
+            if len(batch) >= BULK_BATCH_SIZE:
+                yield await run_in_threadpool(apply_bulk_batch, batch)
+                batch = []
+        if batch:
+            yield await run_in_threadpool(apply_bulk_batch, batch)
+
+    return DuplexStreamingResponse(results(), media_type=NDJSON_MEDIA_TYPE)
+
+
+def apply_bulk_batch(batch : list[tuple[int, bytes | None]]) -> bytes:
+    """Validate and write one batch of (line_number, line) pairs and return its result lines"""
+    results = {}
+    operations = []
+    writes = []
+    for (line_number, line), operation in zip(batch, bulk_validator.validate([line for _, line in batch])):
+        if operation is None:
+            errors = [{"type": "too_long", "msg": f"Line is longer than {MAX_LINE_BYTES} bytes"}]
+            results[line_number] = BulkResult(line=line_number, status="invalid", errors=errors)
+            continue
+        try:
+            if isinstance(operation, ValidationError):
+                raise operation
+            writes.append((operation.item_id, bulk_write(operation)))
+            operations.append((line_number, operation))
+        except ValidationError as e:
+            errors = e.errors(include_url=False, include_context=False, include_input=False)
+            if not isinstance(operation, ValidationError):
+                errors = [error | {"loc": ("item", *error["loc"])} for error in errors]
+            results[line_number] = BulkResult(line=line_number, status="invalid", errors=errors)
+
+    stored = item_store.write_many(writes)
+    for (line_number, operation), record in zip(operations, stored):
+        if record is None:
+            status = "not_found"
+        else:
+            status = "upserted" if operation.op == "upsert" else "patched"
+        results[line_number] = BulkResult(line=line_number, item_id=operation.item_id, status=status)
+
+    return b"".join(results[line_number].model_dump_json(exclude_none=True).encode() + b"\n" for line_number, _ in batch)
+
+
+def bulk_write(operation):
+    """Store callback for one operation; raises ValidationError for a bad patch"""
+    if operation.op == "upsert":
+        record = operation.item.model_dump(mode="json", exclude_unset=True)
+        return lambda stored_item_data: record
+
+    changes, removed = item_patcher.validate(operation.item, merge=operation.op == "merge")
+
+    def apply_patch(stored_item_data):
+        if stored_item_data is None:
+            return None
+        return item_patcher.apply(stored_item_data, changes, removed)
+
+    return apply_patch
+
+
 @router.get("/{item_id}")
-def read_item(item_id : str):
-    if item_id not in items:
+def read_item(item_id : str, if_none_match : IfNoneMatch = None):
+    entry = item_store.get_versioned(item_id)
+    if entry is None:
         raise HTTPException(status_code=404, detail="Item not found")
-    return {"item_id" : items[item_id]}
+    version, stored_item_data = entry
+    codec = current_codec()
+    etag = version_etag(item_store.epoch, version, codec.name)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    body = response_cache.render(f"item/{codec.name}", item_id, version, stored_item_data,
+                                 lambda stored_item_data: codec.encode({"item_id" : stored_item_data}))
+    return Response(content=body, media_type=codec.media_type, headers={"ETag": etag, "Vary": "Accept"})
 
 @router.put("/{item_id}/")
 def update_item(item_id : str, item : Item):
-    items[item_id] = item.model_dump(exclude_unset=True)
-    return {"item_id" : items[item_id]}
-
+    # JSON mode keeps stored records plain JSON values, which is also what the write-ahead log holds
+    stored_item_data = item_store.put(item_id, item.model_dump(mode="json", exclude_unset=True))
+    return {"item_id" : stored_item_data}
 
-@router.patch("/{item_id}")
-def partial_update_item(item_id: str, item: ItemBase):
-    if item_id not in items:
+@router.delete("/{item_id}", status_code=204)
+def delete_item(item_id : str):
+    if not item_store.delete(item_id):
         raise HTTPException(status_code=404, detail="Item not found")
 
-    stored_item_data = items[item_id]
-    stored_item_model = ItemBase.model_validate(stored_item_data)  # Use Pydantic's model_validate
-    update_data = item.model_dump(exclude_unset=True)
-    updated_item = stored_item_model.model_copy(update=update_data)
 
-    items[item_id] = updated_item.dict()
-    return updated_item
+@router.patch("/{item_id}", response_model=ItemBase)
+def partial_update_item(
+    item_id: str,
+    item: Annotated[dict[str, Any], Body()],
+    content_type: Annotated[str | None, Header()] = None,
+):
+    """
+    Change some fields of an item
+
+    Only the fields in the body are validated (against `ItemBase`) and
+    merged into the stored item. With `Content-Type: application/merge-patch+json`
+    the body is an RFC 7396 merge patch, where null removes a field. The
+    response is the whole updated item, with defaults for unset fields.
+    """
+    merge = (content_type or "").split(";")[0].strip().lower() == MERGE_PATCH_MEDIA_TYPE
+    try:
+        changes, removed = item_patcher.validate(item, merge=merge)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [error | {"loc": ("body", *error["loc"])} for error in e.errors(include_url=False)], body=item
+        )
+
+    # the merge runs under the item's write lock, so concurrent PATCHes cannot lose updates
+    updated = item_store.update(item_id, lambda stored_item_data: item_patcher.apply(stored_item_data, changes, removed))
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return updated
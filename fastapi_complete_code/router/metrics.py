@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from middleware.metrics import MeteredRoute, metrics_registry
+
+router = APIRouter(
+    tags=["metrics"],
+    route_class=MeteredRoute,
+)
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def read_metrics():
+    # async: rendered on the event loop, the only thread that updates the counters
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
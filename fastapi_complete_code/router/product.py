@@ -1,15 +1,28 @@
 from schemas.product import *
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from databases.fake_db import *
+from dependencies.conditional import IfNoneMatch, etag_matches, not_modified, version_etag
+from serialization.negotiation import current_codec
+from serialization.response_cache import response_cache
+from router.routes import AppRoute
 
 router = APIRouter(
     prefix="/product",
-    tags=["product"]
+    tags=["product"],
+    route_class=AppRoute,
 )
 
 @router.get("/", response_model=ProductOut)
-def read_users(user_id : str):
-    if user_id not in items:
+def read_users(user_id : str, if_none_match : IfNoneMatch = None):
+    entry = item_store.get_versioned(user_id)
+    if entry is None:
         raise HTTPException(status_code = 404, detail="User not found")
-    user_data = items[user_id]
-    return user_data
+    version, user_data = entry
+    codec = current_codec()
+    etag = version_etag(item_store.epoch, version, codec.name)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    # cached bytes skip both the ProductOut validation and the encoding
+    body = response_cache.render(f"product/{codec.name}", user_id, version, user_data,
+                                 lambda user_data: codec.encode(ProductOut.model_validate(user_data).model_dump(mode = "json")))
+    return Response(content = body, media_type = codec.media_type, headers = {"ETag": etag, "Vary": "Accept"})
@@ -0,0 +1,14 @@
+from middleware.metrics import MeteredRoute
+from middleware.profiling import ProfiledRoute
+from serialization.negotiation import NegotiatedRoute
+
+
+class AppRoute(MeteredRoute, ProfiledRoute, NegotiatedRoute):
+    """
+    Route class of the app's routers
+
+    Combines body negotiation (NegotiatedRoute) with reporting sync
+    endpoints' worker threads to the profiler (ProfiledRoute) and counting
+    requests in flight per route (MeteredRoute); the last two are no-ops
+    unless profiling or metrics are on. None knows of the others.
+    """
@@ -1,20 +1,118 @@
-from http.client import HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
 
-from fastapi import APIRouter, FastAPI
 from schemas.users import *
+from serialization.ndjson import MAX_LINE_BYTES, NDJSON_MEDIA_TYPE, DuplexStreamingResponse, NDJSONValidator, iter_ndjson_lines
 from databases.fake_db import *
+from databases.user_repository import DuplicateUser, email_key
+from dependencies.passwords import PasswordQueueFull, password_hasher
+from router.routes import AppRoute
+
+USER_IMPORT_BATCH_SIZE = 1000
+
+user_validator = NDJSONValidator(UserIn)
 
 router = APIRouter(
     prefix = "/users",
-    tags = ["users"]
+    tags = ["users"],
+    route_class = AppRoute,
 )
 
-def fake_password_hasher(raw_password : str):
-    return "supersecret" + raw_password
-
 @router.post("/", response_model=UserOut)
-def create_user(user_in : UserIn):
-    hashed_password = fake_password_hasher(user_in.password)
+async def create_user(user_in : UserIn):
+    # cheap check first, so a taken name does not cost a password hash
+    field = user_store.conflict(user_in.username, user_in.email)
+    if field is not None:
+        raise HTTPException(status_code = 409, detail = f"A user with this {field} already exists")
+    try:
+        # scrypt runs in the password worker processes, not on the event loop or threadpool
+        hashed_password = await password_hasher.hash(user_in.password)
+    except PasswordQueueFull:
+        raise HTTPException(status_code = 503, detail = "Too many signups in progress, try again shortly", headers = {"Retry-After": "1"})
     save_user = UserInDB(**user_in.model_dump(), hashed_password = hashed_password)
+    try:
+        user_store.add(save_user.model_dump())
+    except DuplicateUser as e:
+        raise HTTPException(status_code = 409, detail = str(e))
     return save_user
 
+
+@router.post(
+    "/bulk",
+    response_class = DuplexStreamingResponse,
+    responses = {200: {"description": "One UserImportResult per line", "content": {NDJSON_MEDIA_TYPE: {}}}},
+    openapi_extra = {
+        "requestBody": {
+            "required": True,
+            "content": {NDJSON_MEDIA_TYPE: {"schema": {"type": "string", "description": "One UserIn object per line"}}},
+        }
+    },
+)
+async def import_users(request : Request):
+    """
+    Create accounts from a stream of UserIn objects, one JSON object per line
+
+    Lines are handled in batches of USER_IMPORT_BATCH_SIZE: validated line
+    by line, checked against the unique indexes, hashed across all password
+    workers and stored together, then answered with one result line each
+    before the next batch is read.
+    """
+    async def results():
+        batch = []
+        async for line in iter_ndjson_lines(request.stream()):
+            batch.append(line)
+            if len(batch) >= USER_IMPORT_BATCH_SIZE:
+                yield await import_batch(batch)
+                batch = []
+        if batch:
+            yield await import_batch(batch)
+
+    return DuplexStreamingResponse(results(), media_type = NDJSON_MEDIA_TYPE)
+
+
+async def import_batch(batch : list[tuple[int, bytes | None]]) -> bytes:
+    results = {}
+    accepted = []
+    usernames, emails = set(), set()
+    users = await run_in_threadpool(user_validator.validate, [line for _, line in batch])
+    for (line_number, _), user_in in zip(batch, users):
+        if user_in is None:
+            errors = [{"type": "too_long", "msg": f"Line is longer than {MAX_LINE_BYTES} bytes"}]
+            results[line_number] = UserImportResult(line = line_number, status = "invalid", errors = errors)
+            continue
+        if isinstance(user_in, ValidationError):
+            errors = user_in.errors(include_url = False, include_context = False, include_input = False)
+            results[line_number] = UserImportResult(line = line_number, status = "invalid", errors = errors)
+            continue
+
+        field = user_store.conflict(user_in.username, user_in.email)
+        if field is None and user_in.username in usernames:
+            field = "username"
+        elif field is None and email_key(user_in.email) in emails:
+            field = "email"
+        if field is not None:
+            results[line_number] = UserImportResult(line = line_number, username = user_in.username, status = "duplicate", field = field)
+            continue
+        usernames.add(user_in.username)
+        emails.add(email_key(user_in.email))
+        accepted.append((line_number, user_in))
+
+    hashed_passwords = await password_hasher.hash_many([user_in.password for _, user_in in accepted])
+    records = [
+        UserInDB(**user_in.model_dump(), hashed_password = hashed_password).model_dump()
+        for (_, user_in), hashed_password in zip(accepted, hashed_passwords)
+    ]
+    for (line_number, user_in), field in zip(accepted, user_store.add_many(records)):
+        status = "created" if field is None else "duplicate"
+        results[line_number] = UserImportResult(line = line_number, username = user_in.username, status = status, field = field)
+
+    return b"".join(results[line_number].model_dump_json(exclude_none = True).encode() + b"\n" for line_number, _ in batch)
+
+
+@router.get("/{username}", response_model=UserOut)
+def read_user(username : str):
+    user = user_store.get(username)
+    if user is None:
+        raise HTTPException(status_code = 404, detail = "User not found")
+    return user
@@ -1,9 +1,33 @@
-from pydantic import BaseModel
+from typing import Optional
+
+from pydantic import BaseModel, Field
 
 class FileResponse(BaseModel):
     filename : str
     content_type : str
     file_size : int
+    sha256 : str
+    deduplicated : bool = False
+    detected_content_type : Optional[str] = None
+
+class FileError(BaseModel):
+    index : int
+    filename : str
+    detail : str
 
 class MultipleFileResponse(BaseModel):
     files : list[FileResponse]
+    errors : list[FileError] = []
+
+class UploadSessionCreate(BaseModel):
+    filename : str
+    content_type : str = "application/octet-stream"
+    length : int = Field(ge=0, description="Total size of the file in bytes")
+    sha256 : Optional[str] = Field(None, pattern="^[0-9a-f]{64}$", description="Expected hex digest of the whole file")
+
+class UploadSessionStatus(BaseModel):
+    upload_id : str
+    filename : str
+    content_type : str
+    length : int
+    offset : int
@@ -1,17 +1,54 @@
-from pydantic import BaseModel, Field
-from typing import List, Literal
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Literal, Optional
 
-class FilterParams(BaseModel):
+class ItemFilterParams(BaseModel):
+    """
+    Conditions an item must meet to be listed or exported
+
+    Attributes:
+        tags: Optional list of tags to filter items
+        price_min: Only items priced at least this much
+        price_max: Only items priced at most this much
+        price_with_tax_min: Only items whose price plus tax is at least this much
+        price_with_tax_max: Only items whose price plus tax is at most this much
+    """
+    tags: List[str] = Field(default_factory=list)
+    price_min: Optional[float] = Field(None, ge=0)
+    price_max: Optional[float] = Field(None, ge=0)
+    price_with_tax_min: Optional[float] = Field(None, ge=0)
+    price_with_tax_max: Optional[float] = Field(None, ge=0)
+
+    @model_validator(mode="after")
+    def check_ranges(self):
+        for low, high in (("price_min", "price_max"), ("price_with_tax_min", "price_with_tax_max")):
+            if getattr(self, low) is not None and getattr(self, high) is not None and getattr(self, low) > getattr(self, high):
+                raise ValueError(f"{low} must not be greater than {high}")
+        return self
+
+    def store_filters(self) -> dict:
+        """Keyword arguments for `ItemRepository.page` / `scan`"""
+        return self.model_dump(include={"tags", "price_min", "price_max", "price_with_tax_min", "price_with_tax_max"})
+
+class FilterParams(ItemFilterParams):
     """
     Generic filtering and pagination parameters for item listings
 
     Attributes:
         limit: Maximum number of items to return (1-100)
-        offset: Number of items to skip for pagination
+        offset: Number of items to skip for pagination (ignored when a cursor is given)
         order_by: Field to sort results by
-        tags: Optional list of tags to filter items
+        cursor: Opaque cursor returned as `next_cursor` by the previous page
     """
     limit: int = Field(100, gt=0, le=100)
     offset: int = Field(0, ge=0)
     order_by: Literal["created_at", "updated_at"] = "created_at"
-    tags: List[str] = Field(default_factory=list)
\ No newline at end of file
+    cursor: Optional[str] = None
+
+class ExportParams(ItemFilterParams):
+    """
+    Parameters of a catalog export
+
+    Attributes:
+        format: ndjson (one {"item_id", "item"} object per line) or csv
+    """
+    format: Literal["ndjson", "csv"] = "ndjson"
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, HttpUrl, Field
 from datetime import datetime
-from typing import Optional
+from typing import Annotated, Any, Literal, Optional, Union
 
 
 class Image(BaseModel):
@@ -28,4 +28,49 @@ class ItemBase(BaseModel):
 
 
 class Item(ItemBase):
-    timestamp : datetime
\ No newline at end of file
+    timestamp : datetime
+
+
+class ItemEntry(BaseModel):
+    item_id : str
+    item : dict
+
+
+class ItemPage(BaseModel):
+    items : list[ItemEntry]
+    next_cursor : Optional[str] = None
+
+
+class BulkUpsert(BaseModel):
+    op : Literal["upsert"]
+    item_id : str
+    item : Item
+
+
+class BulkPatch(BaseModel):
+    """`patch` sets the given fields; `merge` applies an RFC 7396 merge patch (null removes a field)"""
+    op : Literal["patch", "merge"]
+    item_id : str
+    item : dict[str, Any]
+
+
+"""
+One line of a bulk request body, e.g.
+{"op": "upsert", "item_id": "foo", "item": {...}}, or the same with op "patch" / "merge"
+"""
+BulkOperation = Annotated[Union[BulkUpsert, BulkPatch], Field(discriminator="op")]
+
+
+class BulkResult(BaseModel):
+    """
+    One line of a bulk response
+
+    Attributes:
+        line: Line number of the operation in the request body
+        status: upserted, patched, not_found or invalid
+        errors: Validation errors of an invalid line
+    """
+    line : int
+    item_id : Optional[str] = None
+    status : Literal["upserted", "patched", "not_found", "invalid"]
+    errors : Optional[list[dict]] = None
@@ -0,0 +1,73 @@
+from typing import Annotated, Any
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+MERGE_PATCH_MEDIA_TYPE = "application/merge-patch+json"
+
+
+class ModelPatcher:
+    """
+    Partial updates of stored records, validated one field at a time
+
+    A patch body is checked against the type and constraints of only the
+    fields it names, instead of validating the whole stored record as a
+    model again. Records are then updated with one shallow merge. Model
+    level validators are not run, so this suits models like `ItemBase`
+    whose rules all sit on individual fields.
+
+    Plain JSON patches set every field they name, null included. RFC 7396
+    merge patches (`merge=True`) treat null as "remove this field"; only
+    fields with a default can be removed.
+
+    Keys that are not fields are treated the way the model's `extra`
+    setting treats them: ignored by default (as PUT and the old PATCH
+    body did), rejected with "forbid" and kept with "allow".
+    """
+
+    def __init__(self, model : type[BaseModel]):
+        self.model = model
+        self._adapters = {
+            name: TypeAdapter(Annotated[(field.annotation, *field.metadata)] if field.metadata else field.annotation)
+            for name, field in model.model_fields.items()
+        }
+        self._required = {name for name, field in model.model_fields.items() if field.is_required()}
+        self._extra = model.model_config.get("extra") or "ignore"
+
+    def validate(self, patch : dict[str, Any], merge : bool = False) -> tuple[dict, tuple]:
+        """
+        Check a patch and return (changes, removed field names)
+
+        Raises a pydantic ValidationError listing every bad field.
+        """
+        changes = {}
+        removed = []
+        errors = []
+        for name, value in patch.items():
+            adapter = self._adapters.get(name)
+            if adapter is None:
+                if self._extra == "forbid":
+                    errors.append({"type": "extra_forbidden", "loc": (name,), "input": value})
+                elif self._extra == "allow":
+                    changes[name] = value
+            elif merge and value is None:
+                if name in self._required:
+                    errors.append({"type": "missing", "loc": (name,), "input": value})
+                else:
+                    removed.append(name)
+            else:
+                try:
+                    changes[name] = adapter.dump_python(adapter.validate_python(value), mode="json")
+                except ValidationError as e:
+                    for error in e.errors(include_url=False):
+                        errors.append({key: error[key] for key in ("type", "input", "ctx") if key in error} | {"loc": (name, *error["loc"])})
+        if errors:
+            raise ValidationError.from_exception_data(self.model.__name__, errors)
+        return changes, tuple(removed)
+
+    @staticmethod
+    def apply(record : dict, changes : dict, removed : tuple = ()) -> dict:
+        """Return a copy of `record` with a validated patch applied"""
+        patched = {**record, **changes}
+        for name in removed:
+            patched.pop(name, None)
+        return patched
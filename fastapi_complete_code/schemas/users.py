@@ -1,3 +1,5 @@
+from typing import Literal, Optional
+
 from pydantic import BaseModel, EmailStr
 
 
@@ -15,4 +17,18 @@ class UserOut(UserBase):
 class UserInDB(UserBase):
     hashed_password : str
 
+class UserImportResult(BaseModel):
+    """
+    One line of a bulk user import response
 
+    Attributes:
+        line: Line number of the account in the request body
+        status: created, duplicate or invalid
+        field: Unique field a duplicate clashed on (username or email)
+        errors: Validation errors of an invalid line
+    """
+    line : int
+    username : Optional[str] = None
+    status : Literal["created", "duplicate", "invalid"]
+    field : Optional[str] = None
+    errors : Optional[list[dict]] = None
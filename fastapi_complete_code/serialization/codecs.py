@@ -0,0 +1,91 @@
+import json
+
+try:
+    import msgpack
+except ImportError:  # optional; without it every client is answered in JSON
+    msgpack = None
+
+
+def json_body(content) -> bytes:
+    """Encode `content` exactly as FastAPI's JSONResponse would"""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+class Codec:
+    """
+    One wire format for request and response bodies
+
+    Attributes:
+        name: Short name, also used to tell cached bodies and ETags apart
+        media_types: Media types it is chosen for; the first one is sent in Content-Type
+        encode: Turns JSON-compatible values into bytes
+        decode: Turns bytes back into JSON-compatible values
+    """
+
+    def __init__(self, name : str, media_types : tuple[str, ...], encode, decode):
+        self.name = name
+        self.media_types = media_types
+        self.encode = encode
+        self.decode = decode
+
+    @property
+    def media_type(self) -> str:
+        return self.media_types[0]
+
+
+JSON_CODEC = Codec("json", ("application/json",), json_body, json.loads)
+
+# in order of preference when a client accepts several equally
+codecs : list[Codec] = [JSON_CODEC]
+
+
+def register_codec(codec : Codec):
+    codecs.append(codec)
+
+
+if msgpack is not None:
+    register_codec(Codec(
+        "msgpack",
+        ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack"),
+        lambda content: msgpack.packb(content, use_bin_type=True),
+        lambda body: msgpack.unpackb(body, raw=False),
+    ))
+
+
+def codec_for_content_type(content_type : str | None) -> Codec | None:
+    if not content_type:
+        return None
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    for codec in codecs:
+        if media_type in codec.media_types:
+            return codec
+    return None
+
+
+def codec_for_accept(accept : str | None) -> Codec:
+    """
+    Pick the response codec for an Accept header
+
+    The supported media type with the highest q-value wins, ties going to
+    the one listed first in the header. Wildcards and anything unsupported
+    fall back to JSON rather than failing with 406.
+    """
+    if not accept:
+        return JSON_CODEC
+    best, best_quality = JSON_CODEC, 0.0
+    for media_range in accept.split(","):
+        media_type, *params = media_range.split(";")
+        codec = codec_for_content_type(media_type)
+        if codec is None:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > best_quality:
+            best, best_quality = codec, quality
+    return best
@@ -0,0 +1,39 @@
+import csv
+import io
+
+ITEM_CSV_COLUMNS = ("item_id", "name", "description", "price", "tax", "tags", "image", "timestamp")
+TAG_SEPARATOR = ";"
+
+
+class ItemCsvWriter:
+    """
+    Encode (item_id, item) pairs as CSV a chunk at a time
+
+    The header row comes out with the first chunk. Rows of a chunk are
+    written to one reused in-memory buffer, so encoding costs no more
+    memory than the chunk itself. Tags are joined with TAG_SEPARATOR and
+    keys outside ITEM_CSV_COLUMNS are left out.
+    """
+
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._writer.writerow(ITEM_CSV_COLUMNS)
+
+    def encode(self, entries) -> bytes:
+        for item_id, item in entries:
+            tags = item.get("tags")
+            self._writer.writerow((
+                item_id,
+                item.get("name"),
+                item.get("description"),
+                item.get("price"),
+                item.get("tax"),
+                TAG_SEPARATOR.join(tags) if tags else None,
+                item.get("image"),
+                item.get("timestamp"),
+            ))
+        chunk = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return chunk
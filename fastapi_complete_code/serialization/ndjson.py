@@ -0,0 +1,99 @@
+import json
+
+from pydantic import TypeAdapter, ValidationError
+from starlette.responses import StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+MAX_LINE_BYTES = 1024 * 1024
+
+
+async def iter_ndjson_lines(chunks, max_line_bytes : int = MAX_LINE_BYTES):
+    """
+    Yield (line_number, line) for every non-blank line of an NDJSON stream
+
+    `chunks` is an async iterable of bytes such as `request.stream()`. Only
+    the line being assembled is buffered. A line longer than
+    `max_line_bytes` is yielded as None and the rest of it is skipped as it
+    arrives, so one oversized record cannot make the buffer grow without
+    bound. Line numbers start at 1 and count blank lines too.
+    """
+    buffer = bytearray()
+    line_number = 0
+    oversized = False
+    async for chunk in chunks:
+        start = 0
+        while (end := chunk.find(b"\n", start)) != -1:
+            line_number += 1
+            if not oversized:
+                buffer += chunk[start:end]
+            if oversized or len(buffer) > max_line_bytes:
+                yield line_number, None
+            elif buffer.strip():
+                yield line_number, bytes(buffer)
+            buffer.clear()
+            oversized = False
+            start = end + 1
+        if not oversized:
+            buffer += chunk[start:]
+            if len(buffer) > max_line_bytes:
+                oversized = True
+                buffer.clear()
+
+    if oversized:
+        yield line_number + 1, None
+    elif buffer.strip():
+        yield line_number + 1, bytes(buffer)
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    Streaming response whose body may be produced while the request body is still being read
+
+    `StreamingResponse` watches for a client disconnect by reading from
+    `receive`, which would take the request body away from a handler that
+    streams its results as it consumes the upload. This variant only
+    streams; a client that goes away shows up as a failed send instead.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+def encode_ndjson(objects) -> bytes:
+    """Serialize JSON-compatible objects as NDJSON, one line each"""
+    return b"".join(json.dumps(value, separators=(",", ":")).encode() + b"\n" for value in objects)
+
+
+class NDJSONValidator:
+    """
+    Validate batches of NDJSON lines against one type
+
+    Every line is validated on its own. Joining the lines into one JSON
+    array would be about a third cheaper, but the array does not keep line
+    boundaries: a line holding `{...},{...}` becomes two values, and a value
+    split over two lines becomes one, which pairs results with the wrong
+    lines.
+    """
+
+    def __init__(self, line_type):
+        self.line = TypeAdapter(line_type)
+
+    def validate(self, lines : list[bytes | None]) -> list:
+        """
+        Parse the lines of a batch (as yielded by `iter_ndjson_lines`)
+
+        Returns one entry per line: the validated value, the line's
+        ValidationError, or None for an oversized line.
+        """
+        values = []
+        for line in lines:
+            if line is None:
+                values.append(None)
+                continue
+            try:
+                values.append(self.line.validate_json(line))
+            except ValidationError as e:
+                values.append(e)
+        return values
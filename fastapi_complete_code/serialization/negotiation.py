@@ -0,0 +1,75 @@
+from contextvars import ContextVar
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+
+from serialization.codecs import JSON_CODEC, Codec, codec_for_accept, codec_for_content_type
+
+_response_codec : ContextVar[Codec] = ContextVar("response_codec", default=JSON_CODEC)
+
+
+def current_codec() -> Codec:
+    """Codec chosen from the Accept header of the request being handled"""
+    return _response_codec.get()
+
+
+class DecodedRequest(Request):
+    """
+    Request whose body is in another codec but is handed to FastAPI as JSON
+
+    The Content-Type seen by FastAPI is rewritten to application/json, so
+    it parses the body through `json()`, which decodes with the codec
+    instead of the JSON parser.
+    """
+
+    def __init__(self, request : Request, codec : Codec):
+        scope = dict(request.scope)
+        scope["headers"] = [
+            (key, b"application/json" if key == b"content-type" else value)
+            for key, value in request.scope["headers"]
+        ]
+        super().__init__(scope, request.receive)
+        self.codec = codec
+
+    async def json(self):
+        if not hasattr(self, "_json"):
+            self._json = self.codec.decode(await self.body())
+        return self._json
+
+
+class NegotiatedRoute(APIRoute):
+    """
+    Route that reads and writes bodies in the codec the client asked for
+
+    Request bodies are decoded according to their Content-Type, and the
+    codec matching the Accept header is made current for the rest of the
+    request, where `NegotiatedResponse` (and handlers building their own
+    responses) pick it up.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def negotiated_handler(request : Request):
+            codec = codec_for_content_type(request.headers.get("content-type"))
+            if codec is not None and codec is not JSON_CODEC:
+                request = DecodedRequest(request, codec)
+            token = _response_codec.set(codec_for_accept(request.headers.get("accept")))
+            try:
+                return await handler(request)
+            finally:
+                _response_codec.reset(token)
+
+        return negotiated_handler
+
+
+class NegotiatedResponse(JSONResponse):
+    """JSONResponse that encodes with the current codec (JSON unless the client accepts another)"""
+
+    def __init__(self, content, status_code = 200, headers = None, media_type = None, background = None):
+        self.codec = current_codec()
+        super().__init__(content, status_code, {"Vary": "Accept", **(headers or {})}, media_type or self.codec.media_type, background)
+
+    def render(self, content) -> bytes:
+        return self.codec.encode(content)
@@ -0,0 +1,85 @@
+import os
+import threading
+from collections import OrderedDict
+
+# rough per-entry cost of the key tuple, the dict slot and the bytes header
+ENTRY_OVERHEAD = 200
+
+
+class ResponseCache:
+    """
+    Serialized response bodies keyed by (kind, item_id) and item version
+
+    An entry is only returned for the exact version it was rendered from,
+    so a body is never served for a record that has since changed, even if
+    its invalidation races with the read that cached it. `invalidate` (hooked
+    to item writes) frees the memory straight away. The cache holds at most
+    `max_bytes` of bodies; the least recently used ones are evicted first.
+    A budget of 0 turns caching off.
+    """
+
+    def __init__(self, max_bytes : int):
+        self.max_bytes = max_bytes
+        self._entries : OrderedDict[tuple[str, str], tuple[int, bytes]] = OrderedDict()
+        self._kinds : set[str] = set()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, kind : str, item_id : str, version : int) -> bytes | None:
+        key = (kind, item_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, kind : str, item_id : str, version : int, body : bytes):
+        cost = len(body) + ENTRY_OVERHEAD
+        if cost > self.max_bytes:
+            return
+        key = (kind, item_id)
+        with self._lock:
+            self._kinds.add(kind)
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous[1]) + ENTRY_OVERHEAD
+            self._entries[key] = (version, body)
+            self._size += cost
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted) + ENTRY_OVERHEAD
+
+    def render(self, kind : str, item_id : str, version : int, record : dict, serialize) -> bytes:
+        """Return the cached body for this version, or `serialize(record)` it and cache the result"""
+        body = self.get(kind, item_id, version)
+        if body is None:
+            body = serialize(record)
+            self.put(kind, item_id, version, body)
+        return body
+
+    def invalidate(self, item_id : str):
+        with self._lock:
+            for kind in self._kinds:
+                entry = self._entries.pop((kind, item_id), None)
+                if entry is not None:
+                    self._size -= len(entry[1]) + ENTRY_OVERHEAD
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+response_cache = ResponseCache(int(os.environ.get("RESPONSE_CACHE_BYTES", 64 * 1024 * 1024)))
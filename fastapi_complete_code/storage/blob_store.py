@@ -0,0 +1,86 @@
+import os
+import re
+import tempfile
+
+HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobWriter:
+    """Temporary file that collects one upload before it is committed to the store"""
+
+    def __init__(self, directory : str):
+        handle, self.path = tempfile.mkstemp(dir=directory, prefix="upload-", suffix=".part")
+        self._file = os.fdopen(handle, "wb")
+
+    def write(self, chunk):
+        self._file.write(chunk)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+    def discard(self):
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class BlobStore:
+    """
+    Local content-addressed storage for uploaded files
+
+    A blob lives at `<root>/<hash[:2]>/<hash[2:4]>/<hash>`, so identical
+    uploads share one file and no directory grows past a few hundred
+    entries. Data is first written to `<root>/tmp` and then renamed into
+    place, which makes every write atomic: readers see either no blob or
+    the complete one.
+    """
+
+    def __init__(self, root : str):
+        self.root = root
+        self._tmp_dir = os.path.join(root, "tmp")
+
+    def path_for(self, sha256 : str) -> str:
+        if not HASH_PATTERN.match(sha256):
+            raise ValueError(f"Not a sha256 hex digest: {sha256!r}")
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def exists(self, sha256 : str) -> bool:
+        return os.path.exists(self.path_for(sha256))
+
+    def open_writer(self) -> BlobWriter:
+        os.makedirs(self._tmp_dir, exist_ok=True)
+        return BlobWriter(self._tmp_dir)
+
+    def commit(self, writer : BlobWriter, sha256 : str) -> bool:
+        """
+        Move a finished upload into place under its hash
+
+        Returns True when the content was already stored; the temporary
+        copy is dropped and nothing new is written.
+        """
+        if self.exists(sha256):
+            writer.discard()
+            return True
+
+        writer.close()
+        return self.commit_file(writer.path, sha256)
+
+    def commit_file(self, path : str, sha256 : str) -> bool:
+        """Rename a complete, fsynced file on the same filesystem into place under its hash"""
+        target = self.path_for(sha256)
+        if os.path.exists(target):
+            os.unlink(path)
+            return True
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(path, target)
+        return False
+
+
+blob_store = BlobStore(os.environ.get("BLOB_STORE_DIR", "blob_store"))
@@ -0,0 +1,29 @@
+import asyncio
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class FileWorkerPool:
+    """
+    Bounded thread pool for per-file upload work
+
+    Finished parts are submitted while the request body is still being
+    parsed, so sniffing, fsync and committing earlier files overlaps with
+    receiving the next one. `max_workers` caps how many files are processed
+    at once across all requests.
+    """
+
+    def __init__(self, max_workers : int):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="file-worker")
+
+    def submit(self, fn, *args) -> Future:
+        return self._executor.submit(fn, *args)
+
+    @staticmethod
+    async def gather(futures : list[Future]) -> list:
+        """Wait for `futures` and return their results (or exceptions) in submission order"""
+        return await asyncio.gather(*(asyncio.wrap_future(future) for future in futures), return_exceptions=True)
+
+
+file_pool = FileWorkerPool(int(os.environ.get("FILES_MAX_WORKERS", "4")))
@@ -0,0 +1,196 @@
+import hashlib
+from dataclasses import dataclass, field
+from typing import Any
+
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+from storage.sniff import SNIFF_BYTES
+
+CHUNK_SIZE = 64 * 1024
+MAX_FIELD_SIZE = 64 * 1024
+
+
+class IngestError(ValueError):
+    pass
+
+
+@dataclass
+class IngestedFile:
+    field_name : str
+    filename : str
+    content_type : str
+    file_size : int
+    sha256 : str
+    head : bytes = field(default=b"", repr=False)
+    sink : Any = field(default=None, repr=False)
+
+
+class _FilePart:
+    """
+    One file part being received
+
+    Part data is copied into a fixed `chunk_size` buffer that is reused for
+    the whole part; the checksum (and the sink, if any) only sees full
+    buffers, so memory stays at one buffer per request no matter how large
+    the file is.
+    """
+
+    def __init__(self, field_name : str, filename : str, content_type : str, buffer : bytearray, sink=None):
+        self.field_name = field_name
+        self.filename = filename
+        self.content_type = content_type
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.head = b""
+        self.sink = sink
+        self._buffer = buffer
+        self._view = memoryview(buffer)
+        self._filled = 0
+
+    def write(self, data : bytes, start : int, end : int):
+        capacity = len(self._buffer)
+        while start < end:
+            take = min(capacity - self._filled, end - start)
+            self._view[self._filled:self._filled + take] = data[start:start + take]
+            self._filled += take
+            start += take
+            if self._filled == capacity:
+                self._flush()
+
+    def finish(self) -> IngestedFile:
+        self._flush()
+        return IngestedFile(
+            field_name=self.field_name,
+            filename=self.filename,
+            content_type=self.content_type,
+            file_size=self.size,
+            sha256=self.digest.hexdigest(),
+            head=self.head,
+            sink=self.sink,
+        )
+
+    def _flush(self):
+        if not self._filled:
+            return
+        chunk = self._view[:self._filled]
+        if not self.size:
+            self.head = bytes(chunk[:SNIFF_BYTES])
+        self.digest.update(chunk)
+        if self.sink is not None:
+            self.sink.write(chunk)
+        self.size += self._filled
+        self._filled = 0
+
+
+class MultipartIngest:
+    """
+    Incremental multipart/form-data reader for large uploads
+
+    Unlike `UploadFile`, nothing is spooled: each file part is hashed and
+    measured as its bytes arrive and then handed to an optional sink.
+    `sink_factory(filename, content_type)` returns an object with
+    `write(chunk)`; leave it as None to only measure the upload. `on_file`
+    is called with each `IngestedFile` as soon as its part ends.
+    """
+
+    def __init__(self, content_type_header : str, sink_factory=None, on_file=None, chunk_size : int = CHUNK_SIZE):
+        content_type, params = parse_options_header(content_type_header)
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise IngestError("Expected a multipart/form-data body with a boundary")
+
+        self.files : list[IngestedFile] = []
+        self._sink_factory = sink_factory
+        self._on_file = on_file
+        self._buffer = bytearray(chunk_size)
+        self._part : _FilePart | None = None
+        self._field_size = 0
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._part_type = b""
+        self._parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+        })
+
+    def feed(self, data : bytes):
+        try:
+            self._parser.write(data)
+        except MultipartParseError as e:
+            raise IngestError(str(e)) from e
+
+    def finish(self) -> list[IngestedFile]:
+        try:
+            self._parser.finalize()
+        except MultipartParseError as e:
+            raise IngestError(str(e)) from e
+        if self._part is not None:
+            raise IngestError("Multipart body ended in the middle of a file")
+        return self.files
+
+    def _on_part_begin(self):
+        self._part = None
+        self._field_size = 0
+        self._disposition = b""
+        self._part_type = b""
+
+    def _on_header_field(self, data : bytes, start : int, end : int):
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data : bytes, start : int, end : int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        name = self._header_name.lower()
+        if name == b"content-disposition":
+            self._disposition = self._header_value
+        elif name == b"content-type":
+            self._part_type = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        if b"name" not in options:
+            raise IngestError('The Content-Disposition header field "name" must be provided')
+        if b"filename" not in options:
+            return
+
+        filename = options[b"filename"].decode("utf-8", errors="replace")
+        content_type = self._part_type.decode("latin-1") or "application/octet-stream"
+        sink = self._sink_factory(filename, content_type) if self._sink_factory else None
+        self._part = _FilePart(options[b"name"].decode("utf-8", errors="replace"), filename, content_type, self._buffer, sink)
+
+    def _on_part_data(self, data : bytes, start : int, end : int):
+        if self._part is not None:
+            self._part.write(data, start, end)
+            return
+        # plain form fields are not used by the upload endpoints; only bound their size
+        self._field_size += end - start
+        if self._field_size > MAX_FIELD_SIZE:
+            raise IngestError("Form field too large")
+
+    def _on_part_end(self):
+        if self._part is not None:
+            ingested = self._part.finish()
+            self._part = None
+            self.files.append(ingested)
+            if self._on_file is not None:
+                self._on_file(ingested)
+
+
+async def ingest_multipart(request : Request, sink_factory=None, on_file=None) -> list[IngestedFile]:
+    """Stream a multipart request body through `MultipartIngest` and return its file parts"""
+    ingest = MultipartIngest(request.headers.get("content-type", ""), sink_factory, on_file)
+    async for chunk in request.stream():
+        if chunk:
+            await run_in_threadpool(ingest.feed, chunk)
+    return await run_in_threadpool(ingest.finish)
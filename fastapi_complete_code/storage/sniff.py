@@ -0,0 +1,57 @@
+SNIFF_BYTES = 512
+
+# (offset, magic bytes, content type), checked in order
+SIGNATURES = [
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (0, b"%PDF-", "application/pdf"),
+    (0, b"PK\x03\x04", "application/zip"),
+    (0, b"\x1f\x8b", "application/gzip"),
+    (0, b"BZh", "application/x-bzip2"),
+    (0, b"\xfd7zXZ\x00", "application/x-xz"),
+    (0, b"7z\xbc\xaf\x27\x1c", "application/x-7z-compressed"),
+    (257, b"ustar", "application/x-tar"),
+    (0, b"\x7fELF", "application/x-executable"),
+    (0, b"OggS", "audio/ogg"),
+    (0, b"ID3", "audio/mpeg"),
+    (0, b"fLaC", "audio/flac"),
+    (4, b"ftyp", "video/mp4"),
+    (0, b"\x1a\x45\xdf\xa3", "video/webm"),
+]
+
+
+def sniff_content_type(head : bytes) -> str | None:
+    """
+    Guess a content type from the first bytes of a file
+
+    Only well-known magic numbers are recognised, plus a text check for
+    content that decodes as UTF-8. Returns None when nothing matches.
+    """
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    for offset, magic, content_type in SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return content_type
+
+    if not head:
+        return None
+    stripped = head.lstrip()
+    if stripped[:1] in (b"{", b"["):
+        text_type = "application/json"
+    elif stripped[:5].lower() in (b"<!doc", b"<html"):
+        text_type = "text/html"
+    elif stripped[:5] == b"<?xml":
+        text_type = "application/xml"
+    else:
+        text_type = "text/plain"
+    if b"\x00" in head:
+        return None
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # a multi-byte character may be cut off at the end of the sample
+        if e.start < len(head) - 3:
+            return None
+    return text_type
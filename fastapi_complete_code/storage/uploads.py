@@ -0,0 +1,259 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import secrets
+import time
+from contextlib import asynccontextmanager
+
+from starlette.concurrency import run_in_threadpool
+
+from storage.blob_store import blob_store
+from storage.ingest import CHUNK_SIZE
+
+UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+CHECKSUM_ALGORITHMS = {"sha256", "sha1", "md5"}
+
+
+class UploadNotFound(KeyError):
+    pass
+
+
+class UploadConflict(ValueError):
+    """The request does not match the session state (wrong offset, too much data, not finished)"""
+
+
+class ChecksumMismatch(ValueError):
+    pass
+
+
+def parse_checksum(header : str) -> tuple[str, bytes]:
+    """Parse an `Upload-Checksum: <algorithm> <base64 digest>` header value"""
+    try:
+        algorithm, encoded = header.split(" ", 1)
+        digest = base64.b64decode(encoded.strip(), validate=True)
+    except ValueError:
+        raise ValueError("Upload-Checksum must be '<algorithm> <base64 digest>'")
+    algorithm = algorithm.lower()
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise ValueError(f"Unsupported checksum algorithm {algorithm!r}")
+    return algorithm, digest
+
+
+class UploadSessions:
+    """
+    Resumable upload sessions stored next to the blob store
+
+    A session is a data file preallocated to the announced length plus a
+    small JSON sidecar holding its metadata and the confirmed offset.
+    Chunks are written straight into the data file at their offset; the
+    offset only moves forward once the chunk has been checked and fsynced,
+    so after a dropped connection (or a restart) the client resumes from
+    exactly the last acknowledged byte.
+
+    Writing, completing and deleting a session are serialized by a
+    per-session lock that only exists while someone holds or waits for it.
+    Sessions with no activity for `max_age` seconds (judged by when their
+    sidecar was last written) are removed by `expire_stale`, which sweeps
+    at most once every `sweep_interval` seconds.
+    """
+
+    def __init__(self, root : str, max_age : float = 24 * 3600, sweep_interval : float = 600):
+        self.root = root
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+        self._locks : dict[str, list] = {}  # upload_id -> [asyncio.Lock, holders and waiters]
+        self._next_sweep = 0.0
+
+    def create(self, filename : str, content_type : str, length : int, sha256 : str | None = None) -> dict:
+        os.makedirs(self.root, exist_ok=True)
+        upload_id = secrets.token_hex(16)
+        with open(self._data_path(upload_id), "wb") as data_file:
+            self._preallocate(data_file.fileno(), length)
+        session = {
+            "upload_id": upload_id,
+            "filename": filename,
+            "content_type": content_type,
+            "length": length,
+            "offset": 0,
+            "sha256": sha256,
+            "created_at": time.time(),
+        }
+        self._save(session)
+        return session
+
+    def get(self, upload_id : str) -> dict:
+        if not UPLOAD_ID_PATTERN.match(upload_id):
+            raise UploadNotFound(upload_id)
+        try:
+            with open(self._meta_path(upload_id)) as meta_file:
+                return json.load(meta_file)
+        except FileNotFoundError:
+            raise UploadNotFound(upload_id)
+
+    async def write_chunk(self, upload_id : str, offset : int, stream, checksum : tuple[str, bytes] | None = None) -> dict:
+        """
+        Write one chunk from the async byte `stream` starting at `offset`
+
+        `offset` must equal the session's current offset. When a checksum
+        is given, the chunk is verified before the offset is advanced; a
+        rejected chunk is simply overwritten by the retry.
+        """
+        async with self._locked(upload_id):
+            session = self.get(upload_id)
+            if offset != session["offset"]:
+                raise UploadConflict(f"Upload-Offset {offset} does not match current offset {session['offset']}")
+
+            digest = hashlib.new(checksum[0]) if checksum else None
+            fd = os.open(self._data_path(upload_id), os.O_WRONLY)
+            try:
+                position = offset
+                async for data in stream:
+                    if not data:
+                        continue
+                    if position + len(data) > session["length"]:
+                        raise UploadConflict("Chunk runs past the announced upload length")
+                    if digest is not None:
+                        digest.update(data)
+                    position += await run_in_threadpool(os.pwrite, fd, data, position)
+
+                if digest is not None and digest.digest() != checksum[1]:
+                    raise ChecksumMismatch("Chunk checksum does not match Upload-Checksum")
+                await run_in_threadpool(os.fsync, fd)
+            finally:
+                os.close(fd)
+
+            session["offset"] = position
+            await run_in_threadpool(self._save, session)
+            return session
+
+    async def complete(self, upload_id : str) -> tuple[dict, bool]:
+        """
+        Verify a fully received upload and move it into the blob store
+
+        Returns the session, now carrying the `sha256` of the whole file,
+        and whether the content was already stored. A session that is gone,
+        including one completed or deleted by a request that got the lock
+        first, raises UploadNotFound.
+        """
+        async with self._locked(upload_id):
+            session = self.get(upload_id)
+            if session["offset"] != session["length"]:
+                raise UploadConflict(f"Upload incomplete: {session['offset']} of {session['length']} bytes received")
+            try:
+                return await run_in_threadpool(self._commit, session)
+            except FileNotFoundError:
+                raise UploadNotFound(upload_id)
+
+    async def delete(self, upload_id : str):
+        async with self._locked(upload_id):
+            self.get(upload_id)
+            await run_in_threadpool(self._remove_files, upload_id)
+
+    async def expire_stale(self) -> int:
+        """Remove sessions idle for longer than `max_age`, if a sweep is due; returns how many"""
+        now = time.time()
+        if now < self._next_sweep:
+            return 0
+        self._next_sweep = now + self.sweep_interval
+        cutoff = now - self.max_age
+        removed = 0
+        for upload_id in await run_in_threadpool(self._idle_since, cutoff):
+            async with self._locked(upload_id):
+                # a chunk may have arrived since the directory was listed
+                if await run_in_threadpool(self._idle_since, cutoff, upload_id):
+                    await run_in_threadpool(self._remove_files, upload_id)
+                    removed += 1
+        return removed
+
+    def _commit(self, session : dict) -> tuple[dict, bool]:
+        upload_id = session["upload_id"]
+        digest = hashlib.sha256()
+        buffer = bytearray(CHUNK_SIZE)
+        view = memoryview(buffer)
+        with open(self._data_path(upload_id), "rb", buffering=0) as data_file:
+            while read := data_file.readinto(buffer):
+                digest.update(view[:read])
+        sha256 = digest.hexdigest()
+
+        if session["sha256"] and session["sha256"] != sha256:
+            raise ChecksumMismatch("Uploaded file does not match the sha256 given when the upload was created")
+
+        deduplicated = blob_store.commit_file(self._data_path(upload_id), sha256)
+        os.unlink(self._meta_path(upload_id))
+        session["sha256"] = sha256
+        return session, deduplicated
+
+    def _idle_since(self, cutoff : float, upload_id : str | None = None) -> list[str]:
+        """Ids of sessions (or just `upload_id`) whose files were last written before `cutoff`"""
+        if upload_id is not None:
+            names = [upload_id + ".json", upload_id + ".data"]
+        else:
+            try:
+                names = os.listdir(self.root)
+            except FileNotFoundError:
+                return []
+        latest : dict[str, float] = {}
+        for name in names:
+            session_id = name.split(".", 1)[0]
+            if not UPLOAD_ID_PATTERN.match(session_id):
+                continue
+            try:
+                modified = os.path.getmtime(os.path.join(self.root, name))
+            except FileNotFoundError:
+                continue
+            latest[session_id] = max(latest.get(session_id, 0.0), modified)
+        return [session_id for session_id, modified in latest.items() if modified < cutoff]
+
+    def _remove_files(self, upload_id : str):
+        for path in (self._meta_path(upload_id), self._meta_path(upload_id) + ".tmp", self._data_path(upload_id)):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    @asynccontextmanager
+    async def _locked(self, upload_id : str):
+        entry = self._locks.get(upload_id)
+        if entry is None:
+            entry = self._locks[upload_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[upload_id]
+
+    def _save(self, session : dict):
+        path = self._meta_path(session["upload_id"])
+        with open(path + ".tmp", "w") as meta_file:
+            json.dump(session, meta_file)
+            meta_file.flush()
+            os.fsync(meta_file.fileno())
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def _preallocate(fd : int, length : int):
+        if length and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(fd, 0, length)
+                return
+            except OSError:
+                pass  # filesystem without fallocate support
+        os.ftruncate(fd, length)
+
+    def _data_path(self, upload_id : str) -> str:
+        return os.path.join(self.root, upload_id + ".data")
+
+    def _meta_path(self, upload_id : str) -> str:
+        return os.path.join(self.root, upload_id + ".json")
+
+
+upload_sessions = UploadSessions(
+    os.path.join(blob_store.root, "uploads"),
+    max_age=float(os.environ.get("UPLOAD_MAX_AGE", str(24 * 3600))),
+)
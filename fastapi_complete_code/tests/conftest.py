@@ -0,0 +1,17 @@
+import os
+
+import pytest
+
+# cheap signups for the HTTP tests; set before dependencies.passwords is imported
+os.environ.setdefault("PASSWORD_SCRYPT_N", "1024")
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    from dependencies.passwords import password_hasher
+    from main import app
+
+    yield TestClient(app)
+    password_hasher.shutdown()
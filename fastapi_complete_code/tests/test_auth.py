@@ -0,0 +1,69 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from dependencies.auth import TokenVerifier
+from middleware.auth import AuthMiddleware
+
+KEY = "test-key"
+
+
+@pytest.fixture
+def verifier():
+    return TokenVerifier(b"test-secret")
+
+
+@pytest.fixture
+def client(verifier):
+    app = FastAPI()
+
+    @app.get("/whoami")
+    def whoami(request : Request):
+        return {"sub": request.auth["sub"]}
+
+    app.add_middleware(AuthMiddleware, verifier=verifier, api_keys=[KEY.encode()], public={app.openapi_url})
+    return TestClient(app)
+
+
+def test_valid_key_and_token_reach_the_route_with_their_claims(client, verifier):
+    response = client.get("/whoami", headers={"X-Key": KEY, "X-Token": verifier.issue("alice")})
+    assert response.status_code == 200
+    assert response.json() == {"sub": "alice"}
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Key": "wrong-key"}, {"X-Key": ""}])
+def test_missing_or_unknown_key_is_forbidden(client, verifier, headers):
+    response = client.get("/whoami", headers={**headers, "X-Token": verifier.issue("alice")})
+    assert response.status_code == 403
+    assert response.json() == {"detail": "X-Key header invalid"}
+
+
+def test_missing_token_is_unauthorized(client):
+    response = client.get("/whoami", headers={"X-Key": KEY})
+    assert response.status_code == 401
+    assert response.json() == {"detail": "X-Token header missing"}
+
+
+@pytest.mark.parametrize("token, reason", [
+    ("not-a-token", "bad signature"),
+    (TokenVerifier(b"other-secret").issue("alice"), "bad signature"),
+    (TokenVerifier(b"test-secret").issue("alice", ttl=-1), "expired"),
+])
+def test_invalid_token_is_unauthorized(client, token, reason):
+    response = client.get("/whoami", headers={"X-Key": KEY, "X-Token": token})
+    assert response.status_code == 401
+    assert response.json() == {"detail": f"X-Token header invalid ({reason})"}
+
+
+def test_revoked_token_is_unauthorized_even_when_cached(client, verifier):
+    token = verifier.issue("alice")
+    headers = {"X-Key": KEY, "X-Token": token}
+    assert client.get("/whoami", headers=headers).status_code == 200
+    verifier.revoke(token)
+    response = client.get("/whoami", headers=headers)
+    assert response.status_code == 401
+    assert response.json() == {"detail": "X-Token header invalid (revoked)"}
+
+
+def test_public_paths_need_no_headers(client):
+    assert client.get("/openapi.json").status_code == 200
@@ -0,0 +1,59 @@
+import json
+
+
+def ndjson(*objects) -> bytes:
+    return b"".join(json.dumps(value).encode() + b"\n" for value in objects)
+
+
+def results(response) -> list[dict]:
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def upsert(item_id, price=60.0):
+    return {"op": "upsert", "item_id": item_id, "item": {"name": item_id, "price": price, "timestamp": "2024-01-01T12:00:00"}}
+
+
+def test_bulk_items_answers_every_line_in_order(client):
+    body = ndjson(upsert("bulk-a"), {"op": "patch", "item_id": "bulk-a", "item": {"price": 70.0}},
+                  {"op": "patch", "item_id": "bulk-missing", "item": {"price": 70.0}}, {"op": "upsert", "item_id": "bulk-b"})
+    lines = results(client.post("/items/bulk", content=body, headers={"content-type": "application/x-ndjson"}))
+    assert [(line["line"], line["status"]) for line in lines] == [(1, "upserted"), (2, "patched"), (3, "not_found"), (4, "invalid")]
+    assert client.get("/items/bulk-a").json()["item_id"]["price"] == 70.0
+
+
+def test_bulk_items_line_with_two_objects_is_one_invalid_line(client):
+    smuggled = json.dumps(upsert("smuggle-a")) + "," + json.dumps(upsert("smuggle-evil"))
+    body = smuggled.encode() + b"\n" + ndjson(upsert("smuggle-b"))
+    lines = results(client.post("/items/bulk", content=body, headers={"content-type": "application/x-ndjson"}))
+
+    assert [(line["line"], line["status"]) for line in lines] == [(1, "invalid"), (2, "upserted")]
+    assert lines[1]["item_id"] == "smuggle-b"
+    assert client.get("/items/smuggle-b").status_code == 200
+    assert client.get("/items/smuggle-a").status_code == 404
+    assert client.get("/items/smuggle-evil").status_code == 404
+
+
+def test_bulk_items_object_split_over_two_lines_is_invalid(client):
+    first = json.dumps(upsert("split-a"))
+    body = (first[:30] + "\n" + first[30:] + "\n").encode() + ndjson(upsert("split-b"))
+    lines = results(client.post("/items/bulk", content=body, headers={"content-type": "application/x-ndjson"}))
+
+    assert [(line["line"], line["status"]) for line in lines] == [(1, "invalid"), (2, "invalid"), (3, "upserted")]
+    assert client.get("/items/split-a").status_code == 404
+
+
+def user(username):
+    return {"username": username, "email": f"{username}@example.com", "password": "correct horse"}
+
+
+def test_bulk_users_line_with_two_objects_is_one_invalid_line(client):
+    smuggled = json.dumps(user("smuggle-a")) + "," + json.dumps(user("smuggle-evil"))
+    body = smuggled.encode() + b"\n" + ndjson(user("smuggle-b"), user("smuggle-b"))
+    lines = results(client.post("/users/bulk", content=body, headers={"content-type": "application/x-ndjson"}))
+
+    assert [(line["line"], line["status"]) for line in lines] == [(1, "invalid"), (2, "created"), (3, "duplicate")]
+    assert lines[1]["username"] == "smuggle-b"
+    assert client.get("/users/smuggle-b").status_code == 200
+    assert client.get("/users/smuggle-a").status_code == 404
+    assert client.get("/users/smuggle-evil").status_code == 404
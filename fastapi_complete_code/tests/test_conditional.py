@@ -0,0 +1,65 @@
+import pytest
+
+ITEM = {"name": "Lamp", "price": 80.0, "tags": ["home"], "timestamp": "2024-01-01T12:00:00"}
+
+
+@pytest.fixture
+def item_id(client, request):
+    item_id = f"etag-{request.node.name}"
+    assert client.put(f"/items/{item_id}/", json=ITEM).status_code == 200
+    return item_id
+
+
+def test_read_returns_an_etag_that_answers_if_none_match_with_304(client, item_id):
+    response = client.get(f"/items/{item_id}")
+    etag = response.headers["etag"]
+    assert response.status_code == 200
+    assert response.headers["vary"] == "Accept"
+
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        cached = client.get(f"/items/{item_id}", headers={"If-None-Match": if_none_match})
+        assert cached.status_code == 304
+        assert cached.content == b""
+        assert cached.headers["etag"] == etag
+
+    assert client.get(f"/items/{item_id}", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+@pytest.mark.parametrize("write", ["put", "patch", "merge"])
+def test_writes_change_the_etag(client, item_id, write):
+    etag = client.get(f"/items/{item_id}").headers["etag"]
+    if write == "put":
+        client.put(f"/items/{item_id}/", json={**ITEM, "price": 90.0})
+    elif write == "patch":
+        client.patch(f"/items/{item_id}", json={"price": 90.0})
+    else:
+        client.patch(f"/items/{item_id}", content=b'{"price": 90.0}', headers={"content-type": "application/merge-patch+json"})
+
+    response = client.get(f"/items/{item_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["item_id"]["price"] == 90.0
+    assert client.get(f"/items/{item_id}", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+
+def test_deleted_item_is_not_answered_with_304(client, item_id):
+    etag = client.get(f"/items/{item_id}").headers["etag"]
+    assert client.delete(f"/items/{item_id}").status_code == 204
+    assert client.get(f"/items/{item_id}", headers={"If-None-Match": etag}).status_code == 404
+
+    client.put(f"/items/{item_id}/", json=ITEM)
+    assert client.get(f"/items/{item_id}", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_product_view_has_its_own_etag_and_304(client, item_id):
+    response = client.get("/product/", params={"user_id": item_id})
+    etag = response.headers["etag"]
+    assert response.status_code == 200
+    assert response.json() == {"name": "Lamp", "description": None, "price": 80.0, "tax": None, "tags": ["home"]}
+    assert client.get("/product/", params={"user_id": item_id}, headers={"If-None-Match": etag}).status_code == 304
+
+    client.patch(f"/items/{item_id}", json={"tax": 8.0})
+    response = client.get("/product/", params={"user_id": item_id}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["tax"] == 8.0
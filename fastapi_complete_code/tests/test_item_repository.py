@@ -0,0 +1,186 @@
+import sys
+import threading
+
+import pytest
+
+from databases.item_repository import ItemRepository
+from databases.snapshot import SnapshotReader
+from databases.wal import WriteAheadLog
+
+SEED = {"seed": {"name": "Seed", "price": 100.0}}
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "items.wal"), str(tmp_path / "items.snap")
+
+
+def open_store(paths, initial=SEED, snapshot=False) -> ItemRepository:
+    wal_path, snapshot_path = paths
+    return ItemRepository(initial, wal=WriteAheadLog(wal_path), snapshot=SnapshotReader(snapshot_path) if snapshot else None)
+
+
+def test_seed_items_are_loaded_on_first_start_only(paths):
+    store = open_store(paths)
+    assert "seed" in store
+    store.put("a", {"name": "A", "price": 60.0})
+    store.close()
+
+    store = open_store(paths)
+    assert store.get("a")["name"] == "A"
+    assert len(store) == 2
+    store.close()
+
+
+def test_deleted_seed_items_stay_deleted_after_compaction(paths):
+    store = open_store(paths)
+    store.delete("seed")
+    store._wal.compact()
+    store.close()
+
+    store = open_store(paths)
+    assert "seed" not in store
+    assert len(store) == 0
+    store.close()
+
+
+def test_writes_survive_a_restart(paths):
+    store = open_store(paths)
+    store.put("a", {"name": "A", "price": 60.0, "tags": ["x"]})
+    store.patch("a", {"price": 70.0})
+    store.write_many([("b", lambda current: {"name": "B", "price": 80.0, "tags": ["x"]})])
+    store.close()
+
+    store = open_store(paths)
+    assert store.get("a")["price"] == 70.0
+    assert sorted(item_id for item_id, _ in store.query(tags=["x"])) == ["a", "b"]
+    store.close()
+
+
+def checkpointed_store(paths) -> ItemRepository:
+    store = open_store(paths, initial={})
+    store.put("a", {"name": "A", "price": 60.0, "tags": ["x"]})
+    store.put("b", {"name": "B", "price": 80.0, "tags": ["x", "y"]})
+    store.checkpoint(paths[1])
+    store.close()
+    return open_store(paths, initial={}, snapshot=True)
+
+
+def test_deleted_snapshot_rows_stay_deleted_after_compaction(paths):
+    store = checkpointed_store(paths)
+    store.delete("a")
+    store._wal.compact()
+    store.close()
+
+    store = open_store(paths, initial={}, snapshot=True)
+    assert "a" not in store
+    assert store.get("b")["name"] == "B"
+    assert len(store) == 1
+    store.close()
+
+
+def test_checkpoint_merges_snapshot_rows_with_newer_writes(paths):
+    store = checkpointed_store(paths)
+    store.patch("b", {"price": 90.0})
+    store.put("c", {"name": "C", "price": 70.0, "tags": ["y"]})
+    store.delete("a")
+    assert store.checkpoint(paths[1]) == 2
+    assert store._base is not None  # written without loading the old snapshot into the indexes
+    store.close()
+
+    store = open_store(paths, initial={}, snapshot=True)
+    assert store.get("a") is None
+    assert store.get("b")["price"] == 90.0
+    assert sorted(item_id for item_id, _ in store.query(tags=["y"])) == ["b", "c"]
+    assert [item_id for item_id, _ in store.query(price_min=85)] == ["b"]
+    entries, _ = store.page(order_by="created_at", limit=10)
+    assert [item_id for item_id, _ in entries] == ["b", "c"]
+    store.close()
+
+
+@pytest.mark.parametrize("load_base", [False, True])
+def test_lock_free_reads_see_snapshot_items_while_they_are_overwritten(paths, load_base):
+    store = open_store(paths, initial={})
+    item_ids = [f"item{number}" for number in range(1000)]
+    for item_id in item_ids:
+        store.put(item_id, {"name": "Old", "price": 60.0})
+    store.checkpoint(paths[1])
+    store.close()
+    store = open_store(paths, initial={}, snapshot=True)
+
+    done = threading.Event()
+    writing = [item_ids[0]]
+    misses = []
+
+    def reader():
+        # keep reading the item being overwritten
+        while not done.is_set():
+            item_id = writing[0]
+            if store.get(item_id) is None or item_id not in store:
+                misses.append(item_id)
+
+    readers = [threading.Thread(target=reader) for _ in range(3)]
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads often, to hit the gaps between steps of a write
+    for thread in readers:
+        thread.start()
+    try:
+        for number, item_id in enumerate(item_ids):
+            writing[0] = item_id
+            store.put(item_id, {"name": "New", "price": 70.0})
+            if load_base and number == len(item_ids) // 2:
+                store.query(name="New")  # moves the rest of the snapshot into memory
+    finally:
+        done.set()
+        for thread in readers:
+            thread.join()
+        sys.setswitchinterval(switch_interval)
+    store.close()
+    assert misses == []
+
+
+@pytest.mark.parametrize("tags", [["common"], ["rare"], ["common", "rare"], ["missing"]])
+def test_filtered_pages_match_a_full_scan_whichever_index_drives_them(tags):
+    store = ItemRepository()
+    for number in range(3000):
+        item_tags = ["common"] if number % 3 else ["common", "rare"] if number % 300 == 0 else []
+        store.put(f"item{number}", {"name": "Item", "price": 50.0 + number % 100, "tags": item_tags})
+    expected = [item_id for item_id, record in store.query() if set(tags) <= set(record["tags"])]
+
+    listed, after = [], None
+    while True:
+        entries, after = store.page(limit=7, after=after, tags=tags)
+        listed += [item_id for item_id, _ in entries]
+        if after is None:
+            break
+    assert listed == expected
+    entries, _ = store.page(limit=5, offset=3, tags=tags)
+    assert [item_id for item_id, _ in entries] == expected[3:8]
+
+
+@pytest.mark.parametrize("filters", [{}, {"tags": ["rare"]}, {"tags": ["common"]}, {"price_min": 120, "tags": ["common"]}])
+def test_scan_yields_every_match_in_creation_order(filters):
+    store = ItemRepository()
+    for number in range(5000):
+        store.put(f"item{number}", {"name": "Item", "price": 50.0 + number % 100, "tags": ["rare"] if number % 500 == 0 else ["common"]})
+    expected = [item_id for item_id, _ in store.query(**filters)]
+    expected.sort(key=lambda item_id: int(item_id[4:]))
+
+    chunks = list(store.scan(chunk_size=10, **filters))
+    assert all(0 < len(chunk) <= 10 for chunk in chunks)
+    assert [item_id for chunk in chunks for item_id, _ in chunk] == expected
+
+
+def test_scan_skips_items_that_stop_matching_midway():
+    store = ItemRepository()
+    for number in range(30):
+        store.put(f"item{number}", {"name": "Item", "price": 60.0, "tags": ["rare"]})
+
+    scan = store.scan(chunk_size=10, tags=["rare"])
+    first = next(scan)
+    store.patch("item25", {"tags": []})
+    store.delete("item26")
+    rest = [item_id for chunk in scan for item_id, _ in chunk]
+    assert len(first) == 10
+    assert "item25" not in rest and "item26" not in rest
+    assert len(rest) == 18
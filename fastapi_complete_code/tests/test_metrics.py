@@ -0,0 +1,60 @@
+from middleware.metrics import MetricsRegistry
+
+ITEM = {"name": "Clock", "price": 60.0, "tags": ["home"], "timestamp": "2024-01-01T12:00:00"}
+READ = 'route="/items/{item_id}",method="GET",status="200"'
+
+
+def scrape(client) -> dict[str, float]:
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    series = {}
+    for line in response.text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            series[name] = float(value)
+    return series
+
+
+def test_requests_are_counted_under_their_route_template(client):
+    for item_id in ("metrics-a", "metrics-b"):
+        assert client.put(f"/items/{item_id}/", json=ITEM).status_code == 200
+    before = scrape(client)
+
+    for item_id in ("metrics-a", "metrics-b", "metrics-a"):
+        response = client.get(f"/items/{item_id}")
+        assert response.status_code == 200
+    after = scrape(client)
+
+    assert after[f"http_request_duration_seconds_count{{{READ}}}"] - before.get(f"http_request_duration_seconds_count{{{READ}}}", 0) == 3
+    assert after[f'http_request_duration_seconds_bucket{{{READ},le="+Inf"}}'] == after[f"http_request_duration_seconds_count{{{READ}}}"]
+    assert after[f"http_response_bytes_total{{{READ}}}"] > before.get(f"http_response_bytes_total{{{READ}}}", 0)
+    assert not any("metrics-a" in name for name in after)
+
+
+def test_in_flight_is_labelled_by_route(client):
+    assert client.get("/items/metrics-missing").status_code == 404
+    series = scrape(client)
+
+    # the scrape itself is the one request being handled
+    assert series['http_requests_in_flight{route="/metrics",method="GET"}'] == 1
+    assert series['http_requests_in_flight{route="/items/{item_id}",method="GET"}'] == 0
+    assert "http_requests_in_flight" not in series
+
+
+def test_unmatched_requests_share_one_label(client):
+    assert client.get("/no/such/path").status_code == 404
+    series = scrape(client)
+
+    assert series['http_request_duration_seconds_count{route="<unmatched>",method="GET",status="404"}'] >= 1
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.enter('/a"b', "GET")
+    registry.observe('/a"b', "GET", 200, 0.001, 0, 2)
+
+    rendered = registry.render()
+
+    assert 'http_request_duration_seconds_count{route="/a\\"b",method="GET",status="200"} 1' in rendered
+    assert 'http_requests_in_flight{route="/a\\"b",method="GET"} 1' in rendered
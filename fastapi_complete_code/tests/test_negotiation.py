@@ -0,0 +1,75 @@
+import pytest
+
+from serialization.codecs import JSON_CODEC, codec_for_accept, codec_for_content_type
+
+msgpack = pytest.importorskip("msgpack")
+
+MSGPACK = "application/msgpack"
+ITEM = {"name": "Kettle", "price": 55.0, "tags": ["kitchen"], "timestamp": "2024-01-01T12:00:00"}
+
+
+@pytest.mark.parametrize("accept, codec", [
+    (None, "json"),
+    ("*/*", "json"),
+    ("text/html", "json"),
+    (MSGPACK, "msgpack"),
+    ("application/x-msgpack", "msgpack"),
+    (f"application/json, {MSGPACK}", "json"),
+    (f"{MSGPACK}, application/json", "msgpack"),
+    (f"application/json;q=0.5, {MSGPACK}", "msgpack"),
+    (f"{MSGPACK};q=0.2, application/json;q=0.9", "json"),
+    (f"{MSGPACK};q=bad, application/json;q=0.1", "json"),
+])
+def test_accept_picks_the_preferred_supported_codec(accept, codec):
+    assert codec_for_accept(accept).name == codec
+
+
+def test_content_type_parameters_and_case_are_ignored():
+    assert codec_for_content_type("Application/JSON; charset=utf-8") is JSON_CODEC
+    assert codec_for_content_type(f"{MSGPACK}; foo=bar").name == "msgpack"
+    assert codec_for_content_type("text/plain") is None
+
+
+def test_item_is_sent_in_the_accepted_codec(client):
+    client.put("/items/codec-kettle/", json=ITEM)
+    as_json = client.get("/items/codec-kettle")
+    as_msgpack = client.get("/items/codec-kettle", headers={"Accept": MSGPACK})
+
+    assert as_json.headers["content-type"] == "application/json"
+    assert as_msgpack.headers["content-type"] == MSGPACK
+    assert as_json.headers["vary"] == as_msgpack.headers["vary"] == "Accept"
+    assert msgpack.unpackb(as_msgpack.content) == as_json.json()
+    # each representation has its own ETag
+    assert as_json.headers["etag"] != as_msgpack.headers["etag"]
+    assert client.get("/items/codec-kettle", headers={"Accept": MSGPACK, "If-None-Match": as_json.headers["etag"]}).status_code == 200
+    assert client.get("/items/codec-kettle", headers={"Accept": MSGPACK, "If-None-Match": as_msgpack.headers["etag"]}).status_code == 304
+
+
+@pytest.mark.parametrize("path, params", [("/items/", {"limit": 2}), ("/filters/", {"limit": 5, "tags": ["a", "b"]})])
+def test_model_responses_are_sent_in_the_accepted_codec(client, path, params):
+    as_json = client.get(path, params=params)
+    as_msgpack = client.get(path, params=params, headers={"Accept": f"application/json;q=0.5, {MSGPACK}"})
+
+    assert as_msgpack.status_code == as_json.status_code == 200
+    assert as_msgpack.headers["content-type"] == MSGPACK
+    assert "Accept" in as_json.headers["vary"] and "Accept" in as_msgpack.headers["vary"]
+    assert msgpack.unpackb(as_msgpack.content) == as_json.json()
+
+
+def test_msgpack_request_bodies_are_decoded(client):
+    response = client.put("/items/codec-pot/", content=msgpack.packb(ITEM), headers={"Content-Type": MSGPACK, "Accept": MSGPACK})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == MSGPACK
+    assert msgpack.unpackb(response.content)["item_id"]["name"] == "Kettle"
+
+    response = client.patch("/items/codec-pot", content=msgpack.packb({"price": 65.0}), headers={"Content-Type": MSGPACK})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert client.get("/items/codec-pot").json()["item_id"]["price"] == 65.0
+
+
+def test_invalid_msgpack_body_is_rejected(client):
+    response = client.put("/items/codec-bad/", content=msgpack.packb({**ITEM, "price": 1.0}), headers={"Content-Type": MSGPACK})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "price"]
+    assert client.put("/items/codec-bad/", content=b"\xc1\xc1", headers={"Content-Type": MSGPACK}).status_code == 400
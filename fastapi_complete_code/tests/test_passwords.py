@@ -0,0 +1,32 @@
+import asyncio
+
+from dependencies.passwords import PasswordHasher, check_password
+
+
+def test_hash_many_leaves_room_for_signups():
+    hasher = PasswordHasher(max_workers=1, max_queue=8, n=2 ** 12)
+    finished = []
+
+    async def signup():
+        await asyncio.sleep(0.2)
+        hashed = await hasher.hash("signup")
+        finished.append("signup")
+        return hashed
+
+    async def batch():
+        hashed = await hasher.hash_many([f"password{number}" for number in range(40)], chunk_size=2, retry_after=0.01)
+        finished.append("batch")
+        return hashed
+
+    async def scenario():
+        await hasher.hash("warm up")  # start the worker process
+        return await asyncio.gather(batch(), signup())
+
+    try:
+        batch_hashes, signup_hash = asyncio.run(scenario())
+    finally:
+        hasher.shutdown()
+    assert finished == ["signup", "batch"]
+    assert hasher.pending == 0 and hasher._bulk == 0
+    assert len(batch_hashes) == 40
+    assert check_password("password7", batch_hashes[7]) and check_password("signup", signup_hash)
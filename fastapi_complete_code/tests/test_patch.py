@@ -0,0 +1,45 @@
+import pytest
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+from schemas.items import ItemBase
+from schemas.patch import ModelPatcher
+
+
+def test_unknown_keys_are_ignored_like_put_does():
+    changes, removed = ModelPatcher(ItemBase).validate({"price": 75, "colour": "red"})
+    assert changes == {"price": 75.0}
+    assert removed == ()
+
+
+def test_unknown_keys_follow_the_model_extra_setting():
+    class Strict(BaseModel):
+        model_config = ConfigDict(extra="forbid")
+        name : str
+
+    with pytest.raises(ValidationError) as error:
+        ModelPatcher(Strict).validate({"name": "x", "colour": "red"})
+    assert error.value.errors()[0]["type"] == "extra_forbidden"
+
+
+def test_field_constraints_and_merge_removal():
+    patcher = ModelPatcher(ItemBase)
+    with pytest.raises(ValidationError) as error:
+        patcher.validate({"price": 10})
+    assert error.value.errors()[0]["loc"] == ("price",)
+
+    changes, removed = patcher.validate({"tax": None, "name": "New"}, merge=True)
+    assert changes == {"name": "New"} and removed == ("tax",)
+    assert ModelPatcher.apply({"name": "Old", "tax": 1.0, "price": 60.0}, changes, removed) == {"name": "New", "price": 60.0}
+    with pytest.raises(ValidationError):
+        patcher.validate({"name": None}, merge=True)
+
+
+@pytest.mark.parametrize("content_type", ["application/json", "application/merge-patch+json"])
+def test_patch_responds_with_the_whole_item_including_defaults(client, content_type):
+    client.put("/items/patched-lamp/", json={"name": "Lamp", "price": 80.0, "timestamp": "2024-01-01T12:00:00"})
+    response = client.patch("/items/patched-lamp", content=b'{"price": 90.0}', headers={"content-type": content_type})
+    assert response.status_code == 200
+    assert response.json() == {
+        "name": "Lamp", "description": None, "price": 90.0, "tags": [], "image": None, "tax": None,
+        "timestamp": "2024-01-01T12:00:00",
+    }
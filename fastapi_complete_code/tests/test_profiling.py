@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from middleware import profiling
+from middleware.profiling import ProfiledRoute, ProfileStore, ProfilingMiddleware
+
+
+def profiled_work():
+    deadline = time.perf_counter() + 0.3
+    while time.perf_counter() < deadline:
+        pass
+
+
+def other_work():
+    deadline = time.perf_counter() + 0.3
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def other_async_work():
+    deadline = time.perf_counter() + 0.1
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(0)
+
+
+def test_profile_holds_only_the_profiled_request(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", True)
+    store = ProfileStore(str(tmp_path))
+    app = FastAPI()
+    app.router.route_class = ProfiledRoute
+
+    @app.get("/profiled")
+    def profiled():
+        profiled_work()
+
+    @app.get("/other")
+    def other():
+        other_work()
+
+    @app.get("/other-async")
+    async def other_async():
+        await other_async_work()
+
+    app.add_middleware(ProfilingMiddleware, store=store, token="secret", sample_rate=0, interval=0.001)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(
+                client.get("/profiled", headers={"X-Profile": "secret"}),
+                client.get("/other"),
+                client.get("/other-async"),
+            )
+
+    profiled, _, _ = asyncio.run(scenario())
+    with open(store.path_for(profiled.headers["x-profile-id"])) as profile_file:
+        profile = profile_file.read()
+    assert "profiled_work" in profile
+    assert "other_work" not in profile and "other_async_work" not in profile
+
+
+def test_profile_names_are_unique_within_a_millisecond(tmp_path):
+    store = ProfileStore(str(tmp_path))
+    names = {store.new_name("GET", "/items/") for _ in range(50)}
+    assert len(names) == 50
+    assert all(profiling.PROFILE_NAME.match(name) for name in names)
@@ -0,0 +1,75 @@
+import os
+import subprocess
+import sys
+
+from databases.fake_db import item_store
+from serialization.response_cache import ENTRY_OVERHEAD, ResponseCache, response_cache
+
+ITEM = {"name": "Lamp", "price": 80.0, "timestamp": "2024-01-01T12:00:00"}
+
+
+def test_bodies_are_served_only_for_the_version_they_were_rendered_from():
+    cache = ResponseCache(10_000)
+    cache.put("item/json", "a", 1, b"one")
+    assert cache.get("item/json", "a", 1) == b"one"
+    assert cache.get("item/json", "a", 2) is None
+    assert cache.get("item/msgpack", "a", 1) is None
+    assert cache.render("item/json", "a", 2, {"v": 2}, lambda record: b"two") == b"two"
+    assert cache.get("item/json", "a", 2) == b"two"
+
+
+def test_invalidate_drops_every_kind_and_frees_the_bytes():
+    cache = ResponseCache(10_000)
+    cache.put("item/json", "a", 1, b"x" * 100)
+    cache.put("product/json", "a", 1, b"y" * 100)
+    cache.put("item/json", "b", 1, b"z" * 100)
+    cache.invalidate("a")
+    assert cache.get("item/json", "a", 1) is None and cache.get("product/json", "a", 1) is None
+    assert len(cache) == 1
+    assert cache.size == 100 + ENTRY_OVERHEAD
+
+
+def test_least_recently_used_bodies_are_evicted_to_stay_within_the_byte_budget():
+    entry = 100 + ENTRY_OVERHEAD
+    cache = ResponseCache(3 * entry)
+    for item_id in "abc":
+        cache.put("item/json", item_id, 1, b"x" * 100)
+    cache.get("item/json", "a", 1)  # now b is the least recently used
+    cache.put("item/json", "d", 1, b"x" * 100)
+
+    assert cache.get("item/json", "b", 1) is None
+    assert all(cache.get("item/json", item_id, 1) is not None for item_id in "acd")
+    assert cache.size == 3 * entry
+    # a body bigger than the whole budget is not cached and evicts nothing
+    cache.put("item/json", "e", 1, b"x" * 3 * entry)
+    assert cache.get("item/json", "e", 1) is None and len(cache) == 3
+
+
+def test_zero_budget_caches_nothing():
+    cache = ResponseCache(0)
+    assert cache.render("item/json", "a", 1, {}, lambda record: b"{}") == b"{}"
+    assert len(cache) == 0 and cache.size == 0
+
+    code = ("from serialization.response_cache import response_cache\n"
+            "response_cache.render('item/json', 'a', 1, {}, lambda record: b'{}')\n"
+            "print(len(response_cache))")
+    output = subprocess.run([sys.executable, "-c", code], env={**os.environ, "RESPONSE_CACHE_BYTES": "0"},
+                            cwd=os.path.dirname(os.path.dirname(__file__)), capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "0"
+
+
+def test_item_writes_invalidate_cached_responses(client):
+    client.put("/items/cached-lamp/", json=ITEM)
+    assert client.get("/items/cached-lamp").json()["item_id"]["price"] == 80.0
+    assert client.get("/product/", params={"user_id": "cached-lamp"}).json()["price"] == 80.0
+    version = item_store.get_versioned("cached-lamp")[0]
+    assert response_cache.get("item/json", "cached-lamp", version) is not None
+
+    client.patch("/items/cached-lamp", json={"price": 95.0})
+    assert response_cache.get("item/json", "cached-lamp", version) is None
+    assert response_cache.get("product/json", "cached-lamp", version) is None
+    assert client.get("/items/cached-lamp").json()["item_id"]["price"] == 95.0
+    assert client.get("/product/", params={"user_id": "cached-lamp"}).json()["price"] == 95.0
+
+    client.delete("/items/cached-lamp")
+    assert client.get("/items/cached-lamp").status_code == 404
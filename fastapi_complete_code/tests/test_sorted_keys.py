@@ -0,0 +1,42 @@
+import random
+from bisect import bisect_left, bisect_right
+
+from databases.range_index import RangeIndex
+from databases.sorted_keys import SortedKeys
+
+
+def test_matches_a_sorted_list_through_splits_and_removals():
+    rng = random.Random(7)
+    keys = SortedKeys(load=4)
+    expected = []
+    for _ in range(2000):
+        key = (rng.randrange(300), f"id{rng.randrange(50)}")
+        if key in expected:
+            assert keys.remove(key)
+            expected.remove(key)
+        else:
+            keys.add(key)
+            expected.append(key)
+            expected.sort()
+    assert list(keys) == expected
+    assert len(keys) == len(expected)
+    assert not keys.remove((-1, "missing"))
+
+    for value in range(-1, 302, 7):
+        assert keys.bisect_left((value,)) == bisect_left(expected, (value,))
+        assert keys.bisect_right((value, "~")) == bisect_right(expected, (value, "~"))
+    for position in (0, 1, 5, len(expected) - 1, len(expected), len(expected) + 3):
+        assert list(keys.iter_from(position)) == expected[position:]
+
+
+def test_range_index_counts_and_lists_inclusive_ranges():
+    index = RangeIndex()
+    for number in range(100):
+        index.add(float(number % 10), f"item{number}")
+    index.remove(3.0, "item3")
+
+    assert index.count(3, 4) == 19
+    assert sorted(index.range(3, 4)) == sorted(f"item{n}" for n in range(100) if n % 10 in (3, 4) and n != 3)
+    assert index.count(None, 0) == 10
+    assert index.count(8, 5) == 0
+    assert index.range(20, None) == []
@@ -0,0 +1,37 @@
+from databases.item_repository import ItemRepository
+from databases.tag_index import TagIndex
+
+
+def test_intersect_starts_from_any_tag_and_matches_all():
+    index = TagIndex()
+    index.add("a", ["x", "y"])
+    index.add("b", ["x"])
+    index.add("c", ["y", "x", "z"])
+    assert sorted(index.intersect(["x", "y"])) == ["a", "c"]
+    assert index.intersect(["x", "missing"]) == []
+    assert index.count("x") == 3
+
+
+def test_create_delete_churn_reuses_ordinals():
+    index = TagIndex()
+    index.add("keep", ["x"])
+    for number in range(1000):
+        index.add(f"temp{number}", ["x", "y"])
+        index.remove(f"temp{number}", ["x", "y"])
+    assert len(index._item_ids) == 2 and len(index._ordinals) == 1
+    assert len(index) == 1
+
+    index.add("new", ["x", "y"])
+    assert sorted(index.intersect(["x"])) == ["keep", "new"]
+    assert index.intersect(["y"]) == ["new"]
+
+
+def test_repository_churn_keeps_the_tag_index_bounded():
+    store = ItemRepository()
+    store.put("keep", {"name": "Keep", "price": 60.0, "tags": ["x"]})
+    for number in range(500):
+        store.put(f"temp{number}", {"name": "Temp", "price": 60.0, "tags": ["x", f"t{number}"]})
+        store.patch(f"temp{number}", {"tags": ["x", "y"]})
+        store.delete(f"temp{number}")
+    assert len(store._by_tag._ordinals) == 1 and len(store._by_tag._item_ids) <= 2
+    assert [item_id for item_id, _ in store.query(tags=["x"])] == ["keep"]
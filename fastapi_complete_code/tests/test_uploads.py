@@ -0,0 +1,65 @@
+import asyncio
+import os
+
+import pytest
+
+from storage import uploads
+from storage.blob_store import BlobStore
+from storage.uploads import UploadNotFound, UploadSessions
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "blob_store", BlobStore(str(tmp_path / "blobs")))
+    return UploadSessions(str(tmp_path / "uploads"))
+
+
+async def chunks(*parts):
+    for part in parts:
+        yield part
+
+
+async def finished_upload(sessions, content=b"hello world") -> str:
+    upload_id = sessions.create("hello.txt", "text/plain", len(content))["upload_id"]
+    await sessions.write_chunk(upload_id, 0, chunks(content))
+    return upload_id
+
+
+def test_concurrent_completes_commit_once(sessions):
+    async def scenario():
+        upload_id = await finished_upload(sessions)
+        return await asyncio.gather(sessions.complete(upload_id), sessions.complete(upload_id), return_exceptions=True)
+
+    first, second = asyncio.run(scenario())
+    assert first[0]["sha256"] and first[1] is False
+    assert isinstance(second, UploadNotFound)
+    assert sessions._locks == {}
+
+
+@pytest.mark.parametrize("delete_first", [False, True])
+def test_complete_and_delete_race_cleanly(sessions, delete_first):
+    async def scenario():
+        upload_id = await finished_upload(sessions)
+        calls = [sessions.delete(upload_id), sessions.complete(upload_id)]
+        return await asyncio.gather(*(reversed(calls) if not delete_first else calls), return_exceptions=True)
+
+    first, second = asyncio.run(scenario())
+    assert not isinstance(first, Exception)
+    assert isinstance(second, UploadNotFound)
+    assert os.listdir(sessions.root) == []
+
+
+def test_expire_stale_removes_only_idle_sessions(sessions):
+    stale = sessions.create("old.bin", "application/octet-stream", 1024)["upload_id"]
+    fresh = sessions.create("new.bin", "application/octet-stream", 1024)["upload_id"]
+    long_ago = 0
+    for suffix in (".json", ".data"):
+        os.utime(os.path.join(sessions.root, stale + suffix), (long_ago, long_ago))
+
+    assert asyncio.run(sessions.expire_stale()) == 1
+    with pytest.raises(UploadNotFound):
+        sessions.get(stale)
+    assert sessions.get(fresh)["filename"] == "new.bin"
+    assert sorted(os.listdir(sessions.root)) == [fresh + ".data", fresh + ".json"]
+    # the next sweep is not due yet
+    assert asyncio.run(sessions.expire_stale()) == 0
@@ -0,0 +1,124 @@
+import os
+import threading
+
+import pytest
+
+from databases.wal import DURABILITY_MODES, WALError, WriteAheadLog, encode_entry, read_entries
+
+
+def put(item_id, price):
+    return {"op": "put", "id": item_id, "item": {"name": item_id, "price": price}}
+
+
+def replayed(path) -> list[dict]:
+    entries = []
+    wal = WriteAheadLog(path)
+    wal.replay(entries.append)
+    wal.close()
+    return entries
+
+
+@pytest.mark.parametrize("durability", DURABILITY_MODES)
+def test_replay_returns_every_entry_in_order(tmp_path, durability):
+    path = str(tmp_path / "items.wal")
+    wal = WriteAheadLog(path, durability=durability)
+    wal.replay(lambda entry: None)
+    wal.append(put("a", 1))
+    wal.append_many([put("b", 2), {"op": "delete", "id": "a"}])
+    wal.close()
+
+    assert replayed(path) == [put("a", 1), put("b", 2), {"op": "delete", "id": "a"}]
+
+
+def test_concurrent_appends_are_all_logged(tmp_path):
+    path = str(tmp_path / "items.wal")
+    wal = WriteAheadLog(path, durability="batch")
+
+    def writer(number):
+        for sequence in range(50):
+            wal.append(put(f"{number}-{sequence}", sequence))
+
+    threads = [threading.Thread(target=writer, args=(number,)) for number in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wal.close()
+
+    entries = replayed(path)
+    assert len(entries) == 400
+    for number in range(8):
+        assert [entry["item"]["price"] for entry in entries if entry["id"].startswith(f"{number}-")] == list(range(50))
+
+
+@pytest.mark.parametrize("tail", [b"0000", b"deadbeef {\"op\":\"put\"", encode_entry(put("c", 3))[:-1]])
+def test_torn_tail_is_cut_off_and_appends_follow_the_last_intact_entry(tmp_path, tail):
+    path = str(tmp_path / "items.wal")
+    with open(path, "wb") as log_file:
+        log_file.write(encode_entry(put("a", 1)) + encode_entry(put("b", 2)) + tail)
+
+    wal = WriteAheadLog(path)
+    assert wal.replay(lambda entry: None) == 2
+    assert os.path.getsize(path) == len(encode_entry(put("a", 1)) + encode_entry(put("b", 2)))
+    wal.append(put("d", 4))
+    wal.close()
+
+    assert [entry["id"] for entry in replayed(path)] == ["a", "b", "d"]
+
+
+def test_replay_stops_at_a_corrupted_entry(tmp_path):
+    path = str(tmp_path / "items.wal")
+    corrupted = bytearray(encode_entry(put("b", 2)))
+    corrupted[-3] ^= 1
+    with open(path, "wb") as log_file:
+        log_file.write(encode_entry(put("a", 1)) + corrupted + encode_entry(put("c", 3)))
+
+    assert [entry["id"] for _, entry in read_entries(path)] == ["a"]
+
+
+def test_compaction_keeps_the_latest_entry_per_id_markers_and_tombstones(tmp_path):
+    path = str(tmp_path / "items.wal")
+    wal = WriteAheadLog(path)
+    wal.replay(lambda entry: None)
+    wal.append({"op": "init"})
+    for price in range(100):
+        wal.append(put("a", price))
+    wal.append(put("b", 1))
+    wal.append(put("c", 1))
+    wal.append({"op": "delete", "id": "c"})
+    before = wal.size()
+
+    wal.compact()
+    wal.append(put("d", 1))
+    assert wal.size() < before
+    wal.close()
+
+    assert replayed(path) == [{"op": "init"}, put("a", 99), put("b", 1), {"op": "delete", "id": "c"}, put("d", 1)]
+
+
+def test_rotation_replays_the_old_log_until_it_is_finished(tmp_path):
+    path = str(tmp_path / "items.wal")
+    wal = WriteAheadLog(path)
+    wal.replay(lambda entry: None)
+    wal.append(put("a", 1))
+    wal.rotate()
+    wal.append(put("b", 2))
+    # a second checkpoint before the first finished keeps both sets of entries
+    wal.rotate()
+    wal.append(put("c", 3))
+    wal.close()
+
+    assert [entry["id"] for entry in replayed(path)] == ["a", "b", "c"]
+
+    wal = WriteAheadLog(path)
+    wal.finish_rotation()
+    wal.close()
+    assert not os.path.exists(path + ".old")
+    assert [entry["id"] for entry in replayed(path)] == ["c"]
+
+
+def test_append_after_close_fails(tmp_path):
+    wal = WriteAheadLog(str(tmp_path / "items.wal"))
+    wal.close()
+    with pytest.raises(WALError):
+        wal.append(put("a", 1))